@@ -0,0 +1,75 @@
+from django.conf import settings
+
+# Поля ответа API и соответствующие им поля values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'thumbnail': 'thumbnail',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+GROUP_FIELDS = {
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+}
+PROFILE_FIELDS = {
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'posts_count': 'counters__posts_count',
+    'followers_count': 'counters__followers_count',
+    'following_count': 'counters__following_count',
+}
+
+
+def media_url(name):
+    return settings.MEDIA_URL + name if name else None
+
+
+CONVERTERS = {
+    'image': media_url,
+    'thumbnail': media_url,
+}
+
+
+class FieldsError(ValueError):
+    pass
+
+
+class Fields:
+    """Разреженный набор полей из ?fields=id,text."""
+
+    def __init__(self, spec, requested=None):
+        names = [name for name in (requested or '').split(',') if name]
+        unknown = set(names) - spec.keys()
+        if unknown:
+            raise FieldsError(
+                f'Неизвестные поля: {", ".join(sorted(unknown))}. '
+                f'Доступны: {", ".join(spec)}'
+            )
+        self.names = names or list(spec)
+        self.lookups = [spec[name] for name in self.names]
+        self.converters = [CONVERTERS.get(name) for name in self.names]
+
+    def values(self, *extra):
+        """Поля для values(): выбранные и нужные для курсора."""
+        return list(dict.fromkeys(self.lookups + list(extra)))
+
+    def row(self, values):
+        return {
+            name: convert(values[lookup]) if convert else values[lookup]
+            for name, lookup, convert in zip(self.names, self.lookups,
+                                             self.converters)
+        }
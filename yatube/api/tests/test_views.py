@@ -0,0 +1,117 @@
+import json
+from http import HTTPStatus
+
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginator import POSTS_ON_PAGE
+
+
+def content(response):
+    return json.loads(b''.join(response.streaming_content)
+                      if response.streaming else response.content)
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author',
+                                              first_name='Лев')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='api',
+                                         description='Описание')
+        for i in range(POSTS_ON_PAGE + 3):
+            Post.objects.create(author=cls.author, group=cls.group,
+                                text=f'Пост {i}')
+        cls.post = Post.objects.latest('pub_date', 'id')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_posts_cursor_pagination(self):
+        """Лента постов листается курсором до конца"""
+        url = reverse('api:posts')
+        first = content(self.client.get(url))
+        self.assertEqual(len(first['results']), POSTS_ON_PAGE)
+        self.assertEqual(first['results'][0]['id'], self.post.id)
+        self.assertIsNone(first['previous_cursor'])
+        second = content(self.client.get(
+            url, {'cursor': first['next_cursor']}
+        ))
+        self.assertEqual(len(second['results']), 3)
+        self.assertIsNone(second['next_cursor'])
+        ids = [post['id'] for post in first['results'] + second['results']]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-id')
+                      .values_list('id', flat=True))
+        )
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только запрошенные поля"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:posts'),
+                                       {'fields': 'id,author', 'limit': 2})
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(content(response)['results'][0],
+                         {'id': self.post.id, 'author': 'author'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"text"', queries[0]['sql'])
+        response = self.client.get(reverse('api:posts'),
+                                   {'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', content(response)['detail'])
+
+    def test_resources(self):
+        """Группы, профили, комментарии и отдельный пост"""
+        cases = {
+            reverse('api:post_detail', args=[self.post.id]):
+                lambda data: data['group'] == 'api' and data['image'] is None,
+            reverse('api:comments', args=[self.post.id]):
+                lambda data: data['results'][0]['author'] == 'reader',
+            reverse('api:groups'):
+                lambda data: data['results'] == [{
+                    'slug': 'api', 'title': 'Группа',
+                    'description': 'Описание',
+                    'posts_count': POSTS_ON_PAGE + 3,
+                }],
+            reverse('api:group_posts', args=['api']):
+                lambda data: len(data['results']) == POSTS_ON_PAGE,
+            reverse('api:profile', args=['author']):
+                lambda data: (data['first_name'], data['posts_count'],
+                              data['followers_count']) == (
+                                  'Лев', POSTS_ON_PAGE + 3, 1),
+            reverse('api:profile_posts', args=['reader']):
+                lambda data: data['results'] == [],
+        }
+        for url, check in cases.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertTrue(check(content(response)))
+
+    def test_follow_feed(self):
+        """Лента подписок только для вошедших"""
+        url = reverse('api:follow')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        client = Client()
+        client.force_login(self.reader)
+        data = content(client.get(url, {'fields': 'id'}))
+        self.assertEqual(data['results'][0], {'id': self.post.id})
+
+    def test_read_only(self):
+        """API только для чтения, неизвестные объекты — 404"""
+        response = self.client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
+        for url in (reverse('api:post_detail', args=[0]),
+                    reverse('api:profile', args=['missing']),
+                    reverse('api:group_posts', args=['missing'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertEqual(content(response), {'detail': 'Не найдено'})
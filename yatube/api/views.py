@@ -0,0 +1,133 @@
+import json
+from http import HTTPStatus
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from posts.models import Comment, Group, Post, User
+from posts.paginator import POSTS_ON_PAGE, CursorPaginator
+from posts.timeline import follow_feed
+from .fields import (
+    COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS, PROFILE_FIELDS, Fields,
+    FieldsError,
+)
+
+MAX_LIMIT = 100
+
+encoder = DjangoJSONEncoder(ensure_ascii=False)
+
+
+def error(detail, status):
+    return JsonResponse({'detail': detail}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(spec):
+    """Только GET: разбирает ?fields= и отдаёт ошибки в JSON."""
+    def decorator(view):
+        @require_safe
+        def wrapper(request, *args, **kwargs):
+            try:
+                fields = Fields(spec, request.GET.get('fields'))
+            except FieldsError as exception:
+                return error(str(exception), HTTPStatus.BAD_REQUEST)
+            try:
+                return view(request, fields, *args, **kwargs)
+            except Http404:
+                return error('Не найдено', HTTPStatus.NOT_FOUND)
+        return wrapper
+    return decorator
+
+
+def stream(rows):
+    """Потоковый JSON: объекты кодируются по одному, без общего списка."""
+    yield '{"results": ['
+    separator = ''
+    for row in rows:
+        yield separator + encoder.encode(row)
+        separator = ', '
+
+
+def page_response(request, fields, queryset, order_field='pub_date'):
+    try:
+        limit = min(int(request.GET.get('limit', POSTS_ON_PAGE)), MAX_LIMIT)
+    except ValueError:
+        return error('limit должен быть числом', HTTPStatus.BAD_REQUEST)
+    paginator = CursorPaginator(
+        queryset.values(*fields.values(order_field, 'id')),
+        max(limit, 1), order_field=order_field
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    # Страница читается сразу: ошибки базы ещё можно вернуть статусом.
+    rows = page.object_list
+
+    def content():
+        yield from stream(fields.row(values) for values in rows)
+        yield '], "next_cursor": {}, "previous_cursor": {}}}'.format(
+            json.dumps(page.next_cursor), json.dumps(page.previous_cursor)
+        )
+    return StreamingHttpResponse(content(),
+                                 content_type='application/json')
+
+
+@api_view(POST_FIELDS)
+def posts(request, fields):
+    return page_response(request, fields, Post.objects.all())
+
+
+@api_view(POST_FIELDS)
+def post_detail(request, fields, post_id):
+    values = get_object_or_404(
+        Post.objects.values(*fields.values()), pk=post_id
+    )
+    return JsonResponse(fields.row(values),
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@api_view(COMMENT_FIELDS)
+def comments(request, fields, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return page_response(request, fields,
+                         Comment.objects.filter(post_id=post_id),
+                         order_field='created')
+
+
+@api_view(GROUP_FIELDS)
+def groups(request, fields):
+    rows = Group.objects.order_by('title', 'pk').values(*fields.values())
+
+    def content():
+        yield from stream(fields.row(values) for values in rows.iterator())
+        yield ']}'
+    return StreamingHttpResponse(content(),
+                                 content_type='application/json')
+
+
+@api_view(POST_FIELDS)
+def group_posts(request, fields, slug):
+    group = get_object_or_404(Group.objects.only('pk'), slug=slug)
+    return page_response(request, fields, Post.objects.filter(group=group))
+
+
+@api_view(PROFILE_FIELDS)
+def profile(request, fields, username):
+    values = get_object_or_404(
+        User.objects.values(*fields.values()), username=username
+    )
+    return JsonResponse(fields.row(values),
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@api_view(POST_FIELDS)
+def profile_posts(request, fields, username):
+    author = get_object_or_404(User.objects.only('pk'), username=username)
+    return page_response(request, fields, Post.objects.filter(author=author))
+
+
+@api_view(POST_FIELDS)
+def follow(request, fields):
+    if not request.user.is_authenticated:
+        return error('Требуется вход', HTTPStatus.UNAUTHORIZED)
+    return page_response(request, fields, follow_feed(request.user))
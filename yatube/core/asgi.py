@@ -0,0 +1,160 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+# Сколько частей ответа ждут медленного клиента, прежде чем поток встанет.
+STREAM_BUFFER = 8
+
+
+class WsgiToAsgi:
+    """ASGI-приложение поверх WSGI-обработчика Django 2.2.
+
+    Django 2.2 не умеет async view, поэтому запрос обрабатывается в пуле
+    потоков, а чтение тела и отдача ответа медленным клиентам идут в
+    цикле событий. Поток ждёт клиента, только когда буфер ответа полон.
+    """
+
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+        body = await self.read_body(receive)
+        loop = asyncio.get_running_loop()
+        response = Response()
+        chunks = asyncio.Queue(maxsize=STREAM_BUFFER)
+        producer = loop.run_in_executor(
+            self.executor, self.produce, self.environ(scope, body),
+            response, chunks, loop
+        )
+        try:
+            started = False
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    await producer
+                if not started:
+                    await send(response.start_message())
+                    started = True
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Клиент мог отключиться: останавливаем поток и ждём close().
+            response.cancelled = True
+            while not chunks.empty():
+                chunks.get_nowait()
+            await asyncio.gather(producer, return_exceptions=True)
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body
+
+    def environ(self, scope, body):
+        server_name, server_port = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', ''),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server_name,
+            'SERVER_PORT': str(server_port),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                name = f'HTTP_{name}'
+            if name in environ:
+                value = f'{environ[name]},{value}'
+            environ[name] = value
+        return environ
+
+    def produce(self, environ, response, chunks, loop):
+        """Обрабатывает запрос, читает и закрывает ответ в одном потоке.
+
+        Соединения с БД, курсоры и маршрутизация реплик привязаны к потоку,
+        поэтому итератор ответа нельзя передавать между потоками пула.
+        """
+        try:
+            response.iterable = self.wsgi_application(
+                environ, response.start_response
+            )
+            for chunk in response.iterable:
+                if response.cancelled:
+                    break
+                asyncio.run_coroutine_threadsafe(
+                    chunks.put(chunk), loop
+                ).result()
+        finally:
+            try:
+                response.close()
+            finally:
+                asyncio.run_coroutine_threadsafe(chunks.put(None), loop)
+
+
+class Response:
+    def __init__(self):
+        self.status = None
+        self.headers = []
+        self.iterable = None
+        self.cancelled = False
+
+    def start_response(self, status, headers, exc_info=None):
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = [(name.lower().encode('latin-1'),
+                         value.encode('latin-1'))
+                        for name, value in headers]
+
+    def start_message(self):
+        return {'type': 'http.response.start', 'status': self.status,
+                'headers': self.headers}
+
+    def close(self):
+        if hasattr(self.iterable, 'close'):
+            self.iterable.close()
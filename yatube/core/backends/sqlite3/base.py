@@ -0,0 +1,15 @@
+from django.db.backends.sqlite3 import base
+
+from core import db
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite, в котором транзакции берут блокировку записи сразу.
+
+    При обычном BEGIN транзакция, начавшаяся с чтения, получает
+    «database is locked» при попытке записи без ожидания busy_timeout.
+    Транзакции, которые только читают, режим берут из core.db.
+    """
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {db.transaction_mode()}')
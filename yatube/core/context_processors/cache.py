@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def cache_timeout(request):
+    return {'cache_timeout': settings.FEED_CACHE_TIMEOUT}
@@ -0,0 +1,9 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.following import followed_authors as load_followed_authors
+
+
+def followed_authors(request):
+    return {'followed_authors': SimpleLazyObject(
+        lambda: load_followed_authors(request.user)
+    )}
@@ -0,0 +1,69 @@
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_state = threading.local()
+
+
+def use_replica(enabled):
+    _state.replica = enabled
+    _state.wrote = False
+
+
+def replica_enabled():
+    return getattr(_state, 'replica', False)
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+def defer_transactions(enabled):
+    """Транзакции потока только читают: BEGIN DEFERRED не ждёт писателей."""
+    _state.deferred = enabled
+
+
+def transaction_mode():
+    if getattr(_state, 'deferred', False):
+        return 'DEFERRED'
+    return settings.SQLITE_TRANSACTION_MODE
+
+
+def read_primary():
+    """До конца запроса читать из primary, сохраняя отметку о записи."""
+    _state.replica = False
+
+
+class ReplicaRouter:
+    """Чтение с реплик внутри view из REPLICA_VIEWS, остальное — primary.
+
+    Режим включает core.middleware.ReplicaRoutingMiddleware; вне запросов
+    (команды, воркеры) все запросы идут в primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and replica_enabled():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
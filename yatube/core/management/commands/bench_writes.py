@@ -0,0 +1,101 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.urls import reverse
+
+from posts.benchmark import percentile
+
+User = get_user_model()
+
+BENCH_USERNAME = 'bench_writes'
+# Настройки SQLite и Django по умолчанию для сравнения; journal_mode
+# переключается один раз до запуска воркеров.
+BASELINE_PRAGMAS = {'synchronous': 'FULL'}
+
+
+def write_comments(post_id, user_id, seconds, baseline):
+    """Процесс-«воркер»: добавляет комментарии, пока не выйдет время."""
+    from django.test import Client
+
+    # Замеряется запись в базу, а не лимиты запросов.
+    settings.RATE_LIMITS = {}
+    if baseline:
+        settings.SQLITE_PRAGMAS = BASELINE_PRAGMAS
+        settings.SQLITE_TRANSACTION_MODE = 'DEFERRED'
+        connections.databases['default']['CONN_MAX_AGE'] = 0
+    client = Client()
+    client.force_login(User.objects.get(pk=user_id))
+    url = reverse('posts:add_comment', args=[post_id])
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            client.post(url, {'text': 'Нагрузочный комментарий'})
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    connections.close_all()
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность записи: несколько процессов, '
+            'как воркеры gunicorn, одновременно добавляют комментарии.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--baseline', action='store_true',
+                            help='Без SQLITE_PRAGMAS и CONN_MAX_AGE.')
+        parser.add_argument('--output', '-o',
+                            help='Файл для результатов в JSON.')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        post = user.posts.create(text='Пост для замера записи')
+        journal_mode = 'DELETE' if options['baseline'] else 'WAL'
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+        connections.close_all()
+        try:
+            with ProcessPoolExecutor(max_workers=options['workers'],
+                                     initializer=django.setup) as pool:
+                futures = [
+                    pool.submit(write_comments, post.pk, user.pk,
+                                options['seconds'], options['baseline'])
+                    for _ in range(options['workers'])
+                ]
+                results = [future.result() for future in futures]
+        finally:
+            user.delete()
+            if options['baseline']:
+                with connection.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode = WAL')
+        latencies = [value for worker, _ in results for value in worker]
+        results = {
+            'workers': options['workers'],
+            'seconds': options['seconds'],
+            'baseline': options['baseline'],
+            'writes': len(latencies),
+            'writes_per_second': round(
+                len(latencies) / options['seconds'], 1
+            ),
+            'locked_errors': sum(errors for _, errors in results),
+            'p50_ms': round(percentile(latencies, 0.5), 2)
+            if latencies else None,
+            'p95_ms': round(percentile(latencies, 0.95), 2)
+            if latencies else None,
+        }
+        for key, value in results.items():
+            self.stdout.write(f'{key}: {value}')
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, indent=2)
@@ -0,0 +1,129 @@
+import bisect
+import threading
+from collections import defaultdict
+from functools import wraps
+from time import perf_counter
+
+# Границы корзин гистограмм; последняя корзина — всё, что больше.
+TIME_BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BOUNDS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METRICS = {
+    'total_ms': TIME_BOUNDS,
+    'sql_ms': TIME_BOUNDS,
+    'template_ms': TIME_BOUNDS,
+    'queries': QUERY_BOUNDS,
+}
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def quantile(self, share):
+        """Верхняя граница корзины, в которую попадает квантиль."""
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= share * self.count and count:
+                if index < len(self.bounds):
+                    return self.bounds[index]
+                return float('inf')
+        return 0
+
+    def buckets(self):
+        labels = [f'≤{bound}' for bound in self.bounds]
+        labels.append(f'>{self.bounds[-1]}')
+        return list(zip(labels, self.counts))
+
+
+class Registry:
+    """Гистограммы метрик по view_name в памяти процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.views = defaultdict(
+                lambda: {name: Histogram(bounds)
+                         for name, bounds in METRICS.items()}
+            )
+
+    def add(self, view_name, values):
+        with self.lock:
+            histograms = self.views[view_name]
+            for name, value in values.items():
+                histograms[name].add(value)
+
+    def snapshot(self):
+        with self.lock:
+            return sorted(self.views.items())
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.sql_time = 0
+        self.template_time = 0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+
+    def values(self):
+        return {
+            'total_ms': round((perf_counter() - self.started) * 1000, 3),
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'queries': self.queries,
+        }
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def activate(metrics):
+    _local.metrics = metrics
+
+
+def timed_render(render):
+    """Обёртка Template.render: считает время внешних шаблонов запроса."""
+    @wraps(render)
+    def wrapper(self, context):
+        metrics = current()
+        if metrics is None or metrics.rendering:
+            return render(self, context)
+        metrics.rendering = True
+        started = perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            metrics.template_time += perf_counter() - started
+            metrics.rendering = False
+    wrapper.timed = True
+    return wrapper
@@ -0,0 +1,175 @@
+import json
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+from core import db, metrics, ratelimit
+from core.views import too_many_requests
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class RequestMetricsMiddleware:
+    """Число и время SQL-запросов, время шаблонов и ответа для доли запросов.
+
+    Пишет заголовок Server-Timing, строку JSON в лог yatube.metrics и
+    гистограммы для core:metrics. При REQUEST_METRICS_SAMPLE_RATE = 0
+    выключается целиком.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not self.sample_rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if not getattr(Template.render, 'timed', False):
+            Template.render = metrics.timed_render(Template.render)
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        request_metrics = metrics.RequestMetrics()
+        metrics.activate(request_metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.activate(None)
+        values = request_metrics.values()
+        match = request.resolver_match
+        view_name = match.view_name if match else '-'
+        metrics.registry.add(view_name, values)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={values["sql_ms"]};desc="{values["queries"]} queries"',
+            f'tpl;dur={values["template_ms"]}',
+            f'total;dur={values["total_ms"]}',
+        ])
+        logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **values,
+        }))
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Отправляет чтение view из REPLICA_VIEWS на реплики.
+
+    После записи клиент на PRIMARY_STICKY_SECONDS закрепляется за primary,
+    чтобы сразу видеть свои изменения несмотря на отставание реплик.
+    """
+
+    cookie_name = 'primary'
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        db.use_replica(False)
+        try:
+            response = self.get_response(request)
+            if db.wrote():
+                response.set_cookie(self.cookie_name, '1',
+                                    max_age=settings.PRIMARY_STICKY_SECONDS,
+                                    httponly=True)
+            if response.streaming:
+                response.streaming_content = self.routed(
+                    response.streaming_content, db.replica_enabled()
+                )
+        finally:
+            db.use_replica(False)
+        return response
+
+    @staticmethod
+    def routed(content, replica):
+        """Включает режим чтения view на время каждого куска потока.
+
+        StreamingHttpResponse читает базу уже после выхода из middleware.
+        """
+        content = iter(content)
+        while True:
+            db.use_replica(replica)
+            try:
+                chunk = next(content)
+            except StopIteration:
+                return
+            finally:
+                db.use_replica(False)
+            yield chunk
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        db.use_replica(
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and self.cookie_name not in request.COOKIES
+        )
+
+
+class TransactionModeMiddleware:
+    """Транзакции GET и HEAD запросов не берут блокировку записи SQLite.
+
+    Такие запросы только читают (например, форма в админке внутри
+    atomic), и с BEGIN IMMEDIATE они ждали бы всех писателей. View из
+    SQLITE_WRITING_GET_VIEWS пишут и на GET и остаются с IMMEDIATE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            db.defer_transactions(False)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        db.defer_transactions(
+            request.method in ('GET', 'HEAD')
+            and request.resolver_match.view_name
+            not in settings.SQLITE_WRITING_GET_VIEWS
+        )
+
+
+class RateLimitMiddleware:
+    """Token bucket для изменяющих запросов к view из RATE_LIMITS.
+
+    Вёдра по пользователю и по IP хранятся в кеше (core.ratelimit);
+    сверх лимита view не вызывается, ответ — 429 с Retry-After.
+    """
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.RATE_LIMITS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method in self.safe_methods:
+            return None
+        view_name = request.resolver_match.view_name
+        limits = settings.RATE_LIMITS.get(view_name)
+        if not limits:
+            return None
+        wait = ratelimit.consume(
+            ratelimit.buckets(request, view_name, limits)
+        )
+        if wait:
+            return too_many_requests(request, wait)
+        return None
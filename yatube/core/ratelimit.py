@@ -0,0 +1,56 @@
+import struct
+import time
+
+from django.core.cache import cache
+
+# Ведро в кеше — 16 байт: остаток жетонов и время последнего списания.
+BUCKET = struct.Struct('<dd')
+BUCKET_KEY = 'ratelimit:{}:{}:{}'
+
+
+def buckets(request, view_name, limits):
+    """Вёдра запроса: {ключ кеша: (запросов, секунд)}.
+
+    limits — настройка из RATE_LIMITS: лимиты 'user' для пользователя
+    (только авторизованного) и 'ip' для адреса клиента.
+    """
+    owners = {'ip': request.META.get('REMOTE_ADDR', '')}
+    if request.user.is_authenticated:
+        owners['user'] = request.user.pk
+    return {
+        BUCKET_KEY.format(view_name, kind, owner): limits[kind]
+        for kind, owner in owners.items() if kind in limits
+    }
+
+
+def consume(limits, now=None):
+    """Берёт по жетону из каждого ведра limits.
+
+    Возвращает 0, если жетоны были во всех вёдрах, иначе сколько секунд
+    ждать следующего; тогда жетоны не списываются. Вёдра читаются одним
+    get_many и пишутся одним set_many; между ними параллельный запрос
+    может взять тот же жетон, и лимит бывает превышен на единицы.
+    """
+    now = time.time() if now is None else now
+    stored = cache.get_many(list(limits))
+    tokens = {}
+    wait = 0
+    for key, (count, period) in limits.items():
+        rate = count / period
+        if key in stored:
+            left, updated = BUCKET.unpack(stored[key])
+            left = min(count, left + (now - updated) * rate)
+        else:
+            left = count
+        if left < 1:
+            wait = max(wait, (1 - left) / rate)
+        tokens[key] = left
+    if wait:
+        return wait
+    # Через period секунд без запросов ведро снова полное: хранить его
+    # дольше не нужно.
+    cache.set_many(
+        {key: BUCKET.pack(left - 1, now) for key, left in tokens.items()},
+        max(period for _, period in limits.values())
+    )
+    return 0
@@ -0,0 +1,58 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.template.base import Template
+
+
+class TemplateProfile:
+    """Время рендера по шаблонам: вызовы, полное и собственное время.
+
+    Собственное время — без вложенных include; время базового шаблона
+    из {% extends %} учитывается отдельно от наследника.
+    """
+
+    def __init__(self):
+        self.stats = defaultdict(lambda: {'calls': 0, 'total': 0.0,
+                                          'own': 0.0})
+        self.stack = []
+
+    def wrap(self, render):
+        def wrapper(template, context):
+            name = template.origin.template_name or template.origin.name
+            self.stack.append(0.0)
+            started = perf_counter()
+            try:
+                return render(template, context)
+            finally:
+                elapsed = perf_counter() - started
+                children = self.stack.pop()
+                stats = self.stats[name]
+                stats['calls'] += 1
+                stats['total'] += elapsed
+                stats['own'] += elapsed - children
+                if self.stack:
+                    self.stack[-1] += elapsed
+        return wrapper
+
+    def rows(self):
+        """Строки отчёта в миллисекундах, сначала самые дорогие."""
+        return sorted(
+            ({'template': name, 'calls': stats['calls'],
+              'total_ms': round(stats['total'] * 1000, 3),
+              'own_ms': round(stats['own'] * 1000, 3)}
+             for name, stats in self.stats.items()),
+            key=lambda row: row['own_ms'], reverse=True
+        )
+
+
+@contextmanager
+def profile_templates():
+    """Профилирует все рендеры шаблонов Django внутри блока with."""
+    profile = TemplateProfile()
+    render = Template._render
+    Template._render = profile.wrap(render)
+    try:
+        yield profile
+    finally:
+        Template._render = render
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from core.asgi import WsgiToAsgi
+
+
+def echo(environ, start_response):
+    start_response('201 Created', [('Content-Type', 'text/plain'),
+                                   ('X-Path', environ['PATH_INFO'])])
+    yield environ['wsgi.input'].read()
+    yield b''
+    yield environ['QUERY_STRING'].encode()
+
+
+class ThreadRecorder:
+    """Ответ по частям, запоминающий потоки, в которых его читают."""
+
+    def __init__(self, size=50):
+        self.size = size
+        self.threads = set()
+        self.closed_in = None
+
+    def __call__(self, environ, start_response):
+        self.threads.add(threading.get_ident())
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return self
+
+    def __iter__(self):
+        for _ in range(self.size):
+            self.threads.add(threading.get_ident())
+            yield b'x'
+
+    def close(self):
+        self.closed_in = threading.get_ident()
+
+
+class WsgiToAsgiTest(SimpleTestCase):
+    def request(self, application, path, body=b'', method='GET',
+                query_string=b''):
+        messages = [
+            {'type': 'http.request', 'body': body[:3], 'more_body': True},
+            {'type': 'http.request', 'body': body[3:]},
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'query_string': query_string, 'headers': [
+                     (b'host', b'testserver'),
+                     (b'content-type', b'text/plain'),
+                 ]}
+        asyncio.run(application(scope, receive, send))
+        return sent
+
+    def test_request_and_streamed_response(self):
+        """Тело запроса и ответ по частям проходят через адаптер"""
+        sent = self.request(WsgiToAsgi(echo, 1), '/путь/', b'hello world',
+                            'POST', b'a=1')
+        self.assertEqual(sent[0]['status'], 201)
+        self.assertIn((b'x-path', '/путь/'.encode()), sent[0]['headers'])
+        self.assertEqual(b''.join(message.get('body', b'')
+                                  for message in sent[1:]),
+                         b'hello worlda=1')
+        self.assertFalse(sent[-1].get('more_body', False))
+
+    def test_django_page(self):
+        """Страница Django отдаётся через ASGI"""
+        sent = self.request(WsgiToAsgi(get_wsgi_application()),
+                            reverse('about:author'))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn('Об авторе'.encode(),
+                      b''.join(message.get('body', b'')
+                               for message in sent[1:]))
+
+    def test_lifespan(self):
+        """Сообщения lifespan подтверждаются"""
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(WsgiToAsgi(echo, 1)({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+    def test_response_stays_on_one_thread(self):
+        """Запрос, чтение и закрытие ответа идут в одном потоке пула"""
+        application = ThreadRecorder()
+        sent = self.request(WsgiToAsgi(application, 4), '/')
+        self.assertEqual(b''.join(message.get('body', b'')
+                                  for message in sent[1:]), b'x' * 50)
+        self.assertEqual(len(application.threads), 1)
+        self.assertEqual(application.closed_in, *application.threads)
+
+    def test_disconnected_client_closes_response(self):
+        """Обрыв отправки останавливает поток и закрывает ответ"""
+        application = ThreadRecorder(size=1000)
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+            if len(sent) > 2:
+                raise OSError('клиент отключился')
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/',
+                 'query_string': b'', 'headers': []}
+        with self.assertRaises(OSError):
+            asyncio.run(WsgiToAsgi(application, 1)(scope, receive, send))
+        self.assertEqual(application.closed_in, *application.threads)
@@ -0,0 +1,233 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core import db
+from core.middleware import (
+    ReplicaRoutingMiddleware, TransactionModeMiddleware,
+)
+from posts.models import Group, Post
+
+User = get_user_model()
+
+REPLICA = 'replica_0'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingTest(SimpleTestCase):
+    def setUp(self):
+        self.router = db.ReplicaRouter()
+        self.addCleanup(db.use_replica, False)
+
+    def route(self, path, method='get', cookies=None, write=False):
+        """Возвращает базу для чтения внутри view и ответ middleware."""
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(request.path)
+        routed = []
+
+        def view(request):
+            routed.append(self.router.db_for_read(Post))
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return routed[0], response
+
+    def test_read_views_use_replica(self):
+        """Ленты и страница поста читаются с реплики"""
+        for path in (reverse('posts:index'),
+                     reverse('posts:group_posts', args=['slug']),
+                     reverse('posts:profile', args=['user']),
+                     reverse('posts:post_detail', args=[1]),
+                     reverse('posts:follow_index')):
+            with self.subTest(path=path):
+                self.assertEqual(self.route(path)[0], REPLICA)
+
+    def test_writes_use_primary(self):
+        """Запись, POST и прочие view идут в primary"""
+        self.assertEqual(self.router.db_for_write(Post), db.PRIMARY)
+        self.assertEqual(
+            self.route(reverse('posts:post_create'), 'post')[0], db.PRIMARY
+        )
+        self.assertEqual(
+            self.route(reverse('posts:profile_follow', args=['user']))[0],
+            db.PRIMARY
+        )
+        db.use_replica(False)
+        self.assertEqual(self.router.db_for_read(Post), db.PRIMARY)
+
+    def test_primary_is_sticky_after_write(self):
+        """После записи клиент временно читает только из primary"""
+        _, response = self.route(reverse('posts:add_comment', args=[1]),
+                                 'post', write=True)
+        cookie = response.cookies[ReplicaRoutingMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], settings.PRIMARY_STICKY_SECONDS)
+        routed, response = self.route(reverse('posts:index'),
+                                      cookies={cookie.key: cookie.value})
+        self.assertEqual(routed, db.PRIMARY)
+        self.assertNotIn(cookie.key, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        """Без реплик всё читается из primary"""
+        db.use_replica(True)
+        self.assertEqual(self.router.db_for_read(Post), db.PRIMARY)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaDatabaseTest(TestCase):
+    """Две SQLite-базы: тестовая как primary и временный файл как реплика."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+        call_command('migrate', database=REPLICA, verbosity=0)
+        cls.user = User.objects.create_user(username='primary')
+        cls.post = Post.objects.create(author=cls.user,
+                                       text='Только в primary')
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_reads_replica_until_write(self):
+        """Лента читается с реплики, после записи — из primary"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(ReplicaRoutingMiddleware.cookie_name, response.cookies)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+
+    def test_other_client_reads_primary_after_write(self):
+        """После чужой записи лента не кешируется со старой реплики"""
+        self.client.get(reverse('posts:index'))
+        writer = Client()
+        writer.force_login(self.user)
+        writer.post(reverse('posts:post_create'), {'text': 'Новый пост'})
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Новый пост', 'Только в primary']
+        )
+        self.assertContains(response, 'Новый пост')
+        with self.settings(PRIMARY_STICKY_SECONDS=0):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_streaming_response_reads_replica(self):
+        """Потоковый ответ API читается с реплики и после выхода из view"""
+        Group.objects.create(title='Только в primary', slug='primary')
+        response = self.client.get(reverse('api:groups'))
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content, '{"results": []}')
+        self.assertFalse(db.replica_enabled())
+
+
+class SqliteTuningTest(SimpleTestCase):
+    """Настройки соединения на отдельном файле SQLite."""
+
+    alias = 'tuning'
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.databases[self.alias] = {
+            'ENGINE': 'core.backends.sqlite3',
+            'NAME': os.path.join(directory, 'tuning.sqlite3'),
+        }
+        self.addCleanup(connections.databases.pop, self.alias)
+        self.connection = connections[self.alias]
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """Новое соединение получает WAL, busy_timeout и размеры кешей"""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        for name in ('busy_timeout', 'mmap_size', 'cache_size'):
+            with self.subTest(pragma=name):
+                self.assertEqual(self.pragma(name),
+                                 settings.SQLITE_PRAGMAS[name])
+
+    def test_atomic_takes_write_lock(self):
+        """transaction.atomic начинается с BEGIN IMMEDIATE"""
+        with CaptureQueriesContext(self.connection) as queries:
+            with transaction.atomic(using=self.alias):
+                self.pragma('user_version')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_reading_transaction_is_deferred(self):
+        """Транзакции только для чтения начинаются с BEGIN DEFERRED"""
+        db.defer_transactions(True)
+        self.addCleanup(db.defer_transactions, False)
+        with CaptureQueriesContext(self.connection) as queries:
+            with transaction.atomic(using=self.alias):
+                self.pragma('user_version')
+        self.assertEqual(queries[0]['sql'], 'BEGIN DEFERRED')
+
+
+class TransactionModeTest(SimpleTestCase):
+    def mode(self, path, method='get'):
+        """Режим транзакций внутри view и после ответа."""
+        request = getattr(RequestFactory(), method)(path)
+        request.resolver_match = resolve(request.path)
+        modes = []
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            modes.append(db.transaction_mode())
+            return HttpResponse()
+
+        middleware = TransactionModeMiddleware(get_response)
+        middleware(request)
+        modes.append(db.transaction_mode())
+        return modes
+
+    def test_get_requests_defer_transactions(self):
+        """GET формы не ждёт писателей, запись и команды — ждут"""
+        create = reverse('posts:post_create')
+        self.assertEqual(self.mode(create), ['DEFERRED', 'IMMEDIATE'])
+        self.assertEqual(self.mode(create, 'post'),
+                         ['IMMEDIATE', 'IMMEDIATE'])
+        follow = reverse('posts:profile_follow', args=['user'])
+        self.assertEqual(self.mode(follow), ['IMMEDIATE', 'IMMEDIATE'])
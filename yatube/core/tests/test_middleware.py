@@ -0,0 +1,76 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.template.base import Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import Histogram, registry
+
+User = get_user_model()
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1)
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        registry.clear()
+
+    def test_server_timing_and_log(self):
+        """Ответ получает Server-Timing, в лог пишется строка JSON"""
+        with self.assertLogs('yatube.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", '
+                         r'tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], HTTPStatus.OK)
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertLessEqual(record['template_ms'], record['total_ms'])
+
+    def test_metrics_page_for_staff_only(self):
+        """Гистограммы по view доступны только персоналу"""
+        with self.assertLogs('yatube.metrics', 'INFO'):
+            self.client.get(reverse('posts:index'))
+            response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        with self.assertLogs('yatube.metrics', 'INFO'):
+            response = self.client.get(reverse('core:metrics'))
+        names = [view['name'] for view in response.context['views']]
+        self.assertIn('posts:index', names)
+        with self.assertLogs('yatube.metrics', 'INFO'):
+            self.client.post(reverse('core:reset_metrics'))
+        self.assertEqual([name for name, _ in registry.snapshot()],
+                         ['core:reset_metrics'])
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_disabled(self):
+        """При нулевой доле middleware не подключается"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(registry.snapshot(), [])
+
+    def test_render_patched_once(self):
+        """Template.render оборачивается один раз"""
+        with self.assertLogs('yatube.metrics', 'INFO'):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(
+            getattr(Template.render.__wrapped__, 'timed', False)
+        )
+
+
+class HistogramTest(TestCase):
+    def test_quantiles(self):
+        """Квантили — верхние границы корзин"""
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 5, 5, 50, 500):
+            histogram.add(value)
+        self.assertEqual(histogram.quantile(0.5), 10)
+        self.assertEqual(histogram.quantile(0.95), float('inf'))
+        self.assertEqual(histogram.mean, 112.1)
@@ -0,0 +1,92 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core.ratelimit import BUCKET, consume
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class TokenBucketTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_consume_and_refill(self):
+        """Жетоны тратятся по одному и восполняются со временем"""
+        limits = {'bucket': (2, 60)}
+        self.assertEqual(consume(limits, now=100), 0)
+        self.assertEqual(consume(limits, now=100), 0)
+        self.assertAlmostEqual(consume(limits, now=100), 30)
+        self.assertAlmostEqual(consume(limits, now=115), 15)
+        self.assertEqual(consume(limits, now=130), 0)
+        self.assertAlmostEqual(consume(limits, now=130), 30)
+
+    def test_all_buckets_must_have_tokens(self):
+        """Отказ в одном ведре не списывает жетоны из других"""
+        self.assertEqual(consume({'small': (1, 60)}, now=100), 0)
+        limits = {'small': (1, 60), 'large': (5, 60)}
+        self.assertAlmostEqual(consume(limits, now=100), 60)
+        left, _ = BUCKET.unpack(cache.get('small'))
+        self.assertEqual(left, 0)
+        self.assertIsNone(cache.get('large'))
+
+    def test_bucket_is_compact(self):
+        """Ведро хранится в 16 байтах"""
+        consume({'bucket': (10, 60)}, now=100)
+        self.assertEqual(cache.get('bucket'), BUCKET.pack(9, 100))
+        self.assertEqual(len(cache.get('bucket')), 16)
+
+
+@override_settings(RATE_LIMITS={
+    'posts:add_comment': {'user': (2, 60), 'ip': (3, 60)},
+})
+class RateLimitMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='limited')
+        cls.other = User.objects.create_user(username='neighbour')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:add_comment', args=[self.post.pk])
+        self.client.force_login(self.author)
+
+    def comment(self):
+        return self.client.post(self.url, {'text': 'Комментарий'})
+
+    def test_user_limit(self):
+        """Сверх лимита пользователя — 429 с Retry-After, без записи"""
+        for _ in range(2):
+            self.assertEqual(self.comment().status_code, HTTPStatus.FOUND)
+        response = self.comment()
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertTemplateUsed(response, 'core/429.html')
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Comment.objects.count(), 2)
+        response = self.client.get(reverse('posts:post_detail',
+                                           args=[self.post.pk]))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_ip_limit(self):
+        """Лимит IP общий для всех пользователей с этого адреса"""
+        for _ in range(2):
+            self.comment()
+        self.client.force_login(self.other)
+        self.assertEqual(self.comment().status_code, HTTPStatus.FOUND)
+        self.assertEqual(self.comment().status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+        response = self.client.post(self.url, {'text': 'Комментарий'},
+                                    REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(RATE_LIMITS={})
+    def test_disabled(self):
+        """Без RATE_LIMITS middleware не подключается"""
+        for _ in range(5):
+            self.assertEqual(self.comment().status_code, HTTPStatus.FOUND)
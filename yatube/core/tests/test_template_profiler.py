@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.template import engines
+from django.template.base import Template
+from django.template.loaders.cached import Loader as CachedLoader
+from django.test import SimpleTestCase
+
+from core.template_profiler import profile_templates
+
+
+class TemplateProfilerTest(SimpleTestCase):
+    def test_includes_and_extends_profiled(self):
+        """Время include и базового шаблона учитывается отдельно"""
+        engine = engines['django']
+        template = engine.from_string(
+            "{% extends 'base.html' %}{% block content %}"
+            "{% for i in items %}{% include 'includes/footer.html' %}"
+            "{% endfor %}{% endblock %}"
+        )
+        with profile_templates() as profile:
+            template.render({'items': range(3)})
+        rows = {row['template']: row for row in profile.rows()}
+        self.assertEqual(rows['includes/footer.html']['calls'], 3 + 1)
+        self.assertEqual(rows['base.html']['calls'], 1)
+        base = rows['base.html']
+        self.assertLess(base['own_ms'], base['total_ms'])
+        self.assertGreaterEqual(
+            base['total_ms'], rows['includes/footer.html']['total_ms']
+        )
+
+    def test_profiler_restores_render(self):
+        """После профилирования рендер шаблонов не изменён"""
+        render = Template._render
+        with profile_templates():
+            self.assertIsNot(Template._render, render)
+        self.assertIs(Template._render, render)
+
+    def test_cached_loader_without_debug(self):
+        """Без DEBUG шаблоны компилируются один раз"""
+        self.assertFalse(settings.DEBUG)
+        loaders = engines['django'].engine.template_loaders
+        self.assertIsInstance(loaders[0], CachedLoader)
@@ -0,0 +1,10 @@
+from django.urls import path
+
+from core import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('metrics/', views.request_metrics, name='metrics'),
+    path('metrics/reset/', views.reset_metrics, name='reset_metrics'),
+]
@@ -1,6 +1,13 @@
-from django.shortcuts import render
+import math
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
 from http import HTTPStatus
 
+from core import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path},
@@ -14,3 +21,42 @@ def permission_denied_view(request, reason=''):
 def server_error(request):
     return render(request, 'core/500.html',
                   status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+def too_many_requests(request, retry_after):
+    retry_after = math.ceil(retry_after)
+    response = render(request, 'core/429.html',
+                      {'retry_after': retry_after},
+                      status=HTTPStatus.TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+@staff_member_required
+def request_metrics(request):
+    views = []
+    for view_name, histograms in metrics.registry.snapshot():
+        views.append({
+            'name': view_name,
+            'count': histograms['total_ms'].count,
+            'metrics': [
+                {'name': name,
+                 'p50': histogram.quantile(0.5),
+                 'p95': histogram.quantile(0.95),
+                 'mean': round(histogram.mean, 2)}
+                for name, histogram in histograms.items()
+            ],
+            'buckets': histograms['total_ms'].buckets(),
+        })
+    context = {
+        'views': views,
+        'sample_rate': settings.REQUEST_METRICS_SAMPLE_RATE,
+    }
+    return render(request, 'core/metrics.html', context)
+
+
+@staff_member_required
+@require_POST
+def reset_metrics(request):
+    metrics.registry.clear()
+    return redirect('core:metrics')
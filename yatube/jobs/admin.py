@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk',
+                    'name',
+                    'status',
+                    'attempts',
+                    'run_after',
+                    'updated')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'payload')
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Показывает состояние очереди или одной задачи.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_id', nargs='?', type=int)
+
+    def handle(self, *args, **options):
+        if options['job_id'] is not None:
+            job = Job.objects.filter(pk=options['job_id']).first()
+            if job is None:
+                raise CommandError(f'Задача {options["job_id"]} не найдена')
+            self.stdout.write(f'{job} попыток: {job.attempts}')
+            if job.last_error:
+                self.stdout.write(job.last_error)
+            return
+        totals = Job.objects.order_by().values('name', 'status').annotate(
+            total=Count('pk')
+        )
+        for row in totals:
+            self.stdout.write(f'{row["name"]} {row["status"]}: '
+                              f'{row["total"]}')
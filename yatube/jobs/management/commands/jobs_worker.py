@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from jobs.queue import (
+    claim, execute, finish, requeue_stale, run_inline, touch,
+)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int,
+                            default=settings.JOBS_CONCURRENCY,
+                            help='Число процессов; 0 — без пула.')
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOBS_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true',
+                            help='Выйти, когда очередь опустеет.')
+
+    def handle(self, *args, **options):
+        self.retry(requeue_stale, options=options)
+        if options['concurrency'] == 0:
+            self.run_inline(options)
+            return
+        # Дочерние процессы не должны наследовать открытые соединения.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['concurrency'],
+                                 initializer=django.setup) as pool:
+            self.run_pool(pool, options)
+
+    def run_inline(self, options):
+        while True:
+            jobs = self.retry(claim, 1, options=options)
+            for job in jobs:
+                run_inline(job)
+                self.report(job)
+            if not jobs:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+
+    def run_pool(self, pool, options):
+        running = {}
+        next_beat = time.monotonic() + settings.JOBS_HEARTBEAT_INTERVAL
+        while True:
+            for job in self.retry(claim,
+                                  options['concurrency'] - len(running),
+                                  options=options):
+                running[pool.submit(execute, job.name, job.payload)] = job
+            if not running:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            done, _ = wait(running, timeout=options['poll_interval'],
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                self.retry(finish, job, future.exception(),
+                           options=options)
+                self.report(job)
+            if running and time.monotonic() >= next_beat:
+                touch([job.pk for job in running.values()])
+                next_beat = (time.monotonic()
+                             + settings.JOBS_HEARTBEAT_INTERVAL)
+
+    def retry(self, func, *args, options):
+        """Повторяет запись в очередь, пока база занята другим писателем."""
+        while True:
+            try:
+                return func(*args)
+            except OperationalError as error:
+                self.stderr.write(f'База занята, повтор: {error}')
+                time.sleep(options['poll_interval'])
+
+    def report(self, job):
+        style = self.style.SUCCESS if job.status == job.DONE else (
+            self.style.WARNING)
+        self.stdout.write(style(str(job)))
@@ -0,0 +1,148 @@
+import json
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from jobs.models import Job
+
+tasks = {}
+
+
+def task(name):
+    """Регистрирует функцию как задачу очереди под именем name.
+
+    Задача выполняется вне транзакции: долгую работу (картинки, сеть)
+    она делает без блокировки базы, а запись оборачивает в короткий
+    atomic сама. Упавшая задача повторяется, поэтому запись должна
+    выдерживать повтор.
+    """
+    def register(func):
+        tasks[name] = func
+        return func
+    return register
+
+
+def enqueue(name, max_attempts=None, **payload):
+    """Ставит задачу в очередь в текущей транзакции."""
+    if name not in tasks:
+        raise KeyError(f'Неизвестная задача {name}')
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps(payload),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS
+    )
+
+
+def status(job_id):
+    return Job.objects.filter(pk=job_id).values_list(
+        'status', flat=True
+    ).first()
+
+
+def claim(limit):
+    """Забирает до limit готовых задач; безопасно для нескольких воркеров."""
+    claimed = []
+    if limit <= 0:
+        return claimed
+    candidates = Job.objects.filter(
+        status=Job.QUEUED, run_after__lte=timezone.now()
+    ).values_list('pk', flat=True)[:limit]
+    for pk in list(candidates):
+        updated = Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+            status=Job.RUNNING, updated=timezone.now()
+        )
+        if updated:
+            claimed.append(Job.objects.get(pk=pk))
+    return claimed
+
+
+def touch(job_ids):
+    """Продлевает выполняемые задачи, чтобы requeue_stale их не вернул."""
+    try:
+        return Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(
+            updated=timezone.now()
+        )
+    except DatabaseError:
+        # База занята дольше busy_timeout: продлим на следующем такте.
+        return 0
+
+
+@contextmanager
+def heartbeat(job):
+    """Пока выполняется блок, продлевает задачу из отдельного потока."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+                touch([job.pk])
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, брошенные упавшим воркером."""
+    stale_before = timezone.now() - timedelta(
+        seconds=settings.JOBS_STALE_AFTER
+    )
+    return Job.objects.filter(
+        status=Job.RUNNING, updated__lt=stale_before
+    ).update(status=Job.QUEUED)
+
+
+def execute(name, payload):
+    """Выполняет задачу; вызывается в процессе пула воркера."""
+    try:
+        tasks[name](**json.loads(payload))
+    finally:
+        connections.close_all()
+
+
+def finish(job, error=None):
+    job.attempts += 1
+    if error is None:
+        job.status = Job.DONE
+        job.last_error = ''
+    else:
+        job.last_error = ''.join(traceback.format_exception(
+            type(error), error, error.__traceback__
+        ))
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.JOBS_RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+    try:
+        with transaction.atomic():
+            job.save(update_fields=['attempts', 'status', 'last_error',
+                                    'run_after', 'updated'])
+    except DatabaseError:
+        # Воркер повторит finish: попытка не должна посчитаться дважды.
+        job.attempts -= 1
+        raise
+
+
+def run_inline(job):
+    """Выполняет захваченную задачу в текущем процессе."""
+    try:
+        with heartbeat(job):
+            tasks[job.name](**json.loads(job.payload))
+    except Exception as error:
+        finish(job, error)
+    else:
+        finish(job)
@@ -0,0 +1,112 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+
+calls = []
+
+
+@queue.task('tests.record')
+def record(value):
+    calls.append(value)
+
+
+@queue.task('tests.fail')
+def fail():
+    raise ValueError('Ошибка задачи')
+
+
+@queue.task('tests.in_transaction')
+def in_transaction():
+    calls.append(transaction.get_connection().in_atomic_block)
+
+
+@override_settings(JOBS_MAX_ATTEMPTS=2, JOBS_RETRY_DELAY=0)
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_unknown_task(self):
+        """Нельзя поставить в очередь незарегистрированную задачу"""
+        with self.assertRaises(KeyError):
+            queue.enqueue('tests.unknown')
+
+    def test_job_runs_once(self):
+        """Задача захватывается одним воркером и выполняется"""
+        job = queue.enqueue('tests.record', value=42)
+        self.assertEqual(queue.status(job.pk), Job.QUEUED)
+        claimed = queue.claim(10)
+        self.assertEqual(claimed, [job])
+        self.assertEqual(queue.status(job.pk), Job.RUNNING)
+        self.assertEqual(queue.claim(10), [])
+        queue.run_inline(claimed[0])
+        self.assertEqual(calls, [42])
+        self.assertEqual(queue.status(job.pk), Job.DONE)
+
+    def test_failed_job_retries_then_fails(self):
+        """Упавшая задача повторяется до исчерпания попыток"""
+        job = queue.enqueue('tests.fail')
+        queue.run_inline(queue.claim(1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('Ошибка задачи', job.last_error)
+        queue.run_inline(queue.claim(1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(queue.claim(1), [])
+
+    @override_settings(JOBS_STALE_AFTER=60)
+    def test_running_job_is_not_requeued(self):
+        """Продлённая задача не считается брошенной"""
+        job = queue.enqueue('tests.record', value=1)
+        queue.claim(1)
+        Job.objects.filter(pk=job.pk).update(
+            updated=timezone.now() - timedelta(minutes=5)
+        )
+        self.assertEqual(queue.touch([job.pk]), 1)
+        self.assertEqual(queue.requeue_stale(), 0)
+        self.assertEqual(queue.status(job.pk), Job.RUNNING)
+
+    def test_failed_finish_is_retried_once(self):
+        """Неудачная запись результата не съедает попытку"""
+        job = queue.enqueue('tests.record', value=1)
+        job, = queue.claim(1)
+        with mock.patch.object(Job, 'save', side_effect=OperationalError):
+            with self.assertRaises(OperationalError):
+                queue.finish(job)
+        self.assertEqual(job.attempts, 0)
+        queue.finish(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+
+    def test_worker_retries_locked_database(self):
+        """Воркер переживает «database is locked» при захвате задач"""
+        with mock.patch(
+            'jobs.management.commands.jobs_worker.claim',
+            side_effect=[OperationalError('database is locked'), []]
+        ) as claim:
+            call_command('jobs_worker', concurrency=0, once=True,
+                         poll_interval=0, stdout=StringIO(),
+                         stderr=StringIO())
+        self.assertEqual(claim.call_count, 2)
+
+
+class TransactionTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_tasks_run_outside_transaction(self):
+        """Задача не держит транзакцию (и блокировку SQLite) целиком"""
+        queue.enqueue('tests.in_transaction')
+        queue.run_inline(queue.claim(1)[0])
+        queue.execute('tests.in_transaction', '{}')
+        self.assertEqual(calls, [False, False])
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from posts.models import Post, Group, Comment, Follow
+from posts.search import search_ids
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,11 +11,17 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search_ids(search_term)), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('slug',
                     'title',
-                    'description')
+                    'description',
+                    'posts_count')
     search_fields = ('title',)
 
 
@@ -0,0 +1,335 @@
+import json
+import platform
+import random
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+from itertools import accumulate, islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+
+from posts import search, timeline
+from posts.counters import recount
+from posts.exchange import keeping_dates
+from posts.following import FOLLOW_BATCH_SIZE
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+from posts.paginator import POSTS_ON_PAGE
+
+BATCH_SIZE = 1000
+SKEW = 1.1
+GROUP_SHARE = 0.7
+DAYS = 365
+
+# Данных создаётся много и сразу, поэтому производные данные
+# пересобираются целиком, а не по строкам, как при import_data.
+DERIVED_DATA = {
+    'groups': (recount,),
+    'posts': (recount, timeline.rebuild, search.rebuild),
+    'comments': (recount,),
+    'follows': (recount, timeline.rebuild),
+}
+
+
+def zipf_weights(size, skew=SKEW):
+    """Веса «длинного хвоста»: первые элементы выбираются гораздо чаще."""
+    return [1 / (rank ** skew) for rank in range(1, size + 1)]
+
+
+class Skewed:
+    """Случайный выбор из population с весами zipf_weights."""
+
+    def __init__(self, rng, population, skew=SKEW):
+        self.random = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            zipf_weights(len(self.population), skew)
+        ))
+
+    def pick(self, count):
+        if not self.population:
+            return [None] * count
+        return self.random.choices(self.population,
+                                   cum_weights=self.cum_weights, k=count)
+
+
+def in_batches(objects, batch_size=BATCH_SIZE):
+    objects = iter(objects)
+    batch = list(islice(objects, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(objects, batch_size))
+
+
+class DataGenerator:
+    """Синтетические пользователи, группы, посты, комментарии и подписки.
+
+    Авторы, группы и обсуждаемые посты распределены по закону Ципфа.
+    """
+
+    def __init__(self, seed=None, skew=SKEW):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.skew = skew
+        self.now = timezone.now()
+
+    def create(self, model, objects):
+        total = 0
+        for batch in in_batches(objects):
+            model.objects.bulk_create(batch)
+            total += len(batch)
+        return total
+
+    def users(self, count):
+        password = make_password(None)
+        offset = User.objects.count()
+        return self.create(User, (
+            User(username=f'{self.fake.user_name()}{offset + i}',
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(),
+                 password=password)
+            for i in range(count)
+        ))
+
+    def groups(self, count):
+        offset = Group.objects.count()
+        return self.create(Group, (
+            Group(title=self.fake.sentence(nb_words=3)[:200],
+                  slug=f'group-{offset + i}',
+                  description=self.fake.text(max_nb_chars=400))
+            for i in range(count)
+        ))
+
+    def skewed(self, queryset):
+        return Skewed(self.random, queryset, self.skew)
+
+    def posts(self, count):
+        authors = self.skewed(User.objects.values_list('pk', flat=True))
+        groups = self.skewed(Group.objects.values_list('pk', flat=True))
+
+        def build():
+            for author_id, group_id in zip(authors.pick(count),
+                                           groups.pick(count)):
+                if self.random.random() >= GROUP_SHARE:
+                    group_id = None
+                yield Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=self.fake.paragraph(
+                        nb_sentences=self.random.randint(1, 8)
+                    ),
+                    pub_date=self.now - timedelta(
+                        seconds=self.random.randint(0, DAYS * 24 * 3600)
+                    ),
+                )
+        return self.create(Post, build())
+
+    def comments(self, count):
+        users = list(User.objects.values_list('pk', flat=True))
+        posts = self.skewed(Post.objects.values_list('pk', 'pub_date'))
+
+        def build():
+            for post_id, pub_date in posts.pick(count):
+                seconds = int((self.now - pub_date).total_seconds())
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.random.choice(users),
+                    text=self.fake.sentence(),
+                    created=pub_date + timedelta(
+                        seconds=self.random.randint(0, max(seconds, 0))
+                    ),
+                )
+        return self.create(Comment, build())
+
+    def follows(self, count):
+        users = list(User.objects.values_list('pk', flat=True))
+        authors = self.skewed(users)
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        count = min(count, len(users) * (len(users) - 1) - len(existing))
+        pairs = set()
+        # Популярных авторов на всех не хватит: число попыток ограничено.
+        for attempt in range(count * 10):
+            if len(pairs) >= count:
+                break
+            pair = self.random.choice(users), authors.pick(1)[0]
+            if pair[0] != pair[1] and pair not in existing:
+                pairs.add(pair)
+        return self.create(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs
+        ))
+
+    def generate(self, users=0, groups=0, posts=0, comments=0, follows=0):
+        """Создаёт данные и пересобирает счётчики, ленты и индекс."""
+        created = {}
+        with transaction.atomic(), keeping_dates(
+                Post._meta.get_field('pub_date'),
+                Comment._meta.get_field('created')):
+            for kind, count in (('users', users), ('groups', groups),
+                                ('posts', posts), ('comments', comments),
+                                ('follows', follows)):
+                created[kind] = getattr(self, kind)(count) if count else 0
+            refreshes = [recount] if created['users'] else []
+            for kind in DERIVED_DATA:
+                if created[kind]:
+                    refreshes.extend(refresh for refresh in DERIVED_DATA[kind]
+                                     if refresh not in refreshes)
+            for refresh in refreshes:
+                refresh()
+            transaction.on_commit(cache.clear)
+        return created
+
+
+class Scenario:
+    def __init__(self, name, url, user=None, method='get', data=None,
+                 writes=False):
+        self.name = name
+        self.url = url
+        self.user = user
+        self.method = method
+        self.data = data
+        self.writes = writes or method == 'post'
+
+
+def scenarios():
+    """По запросу на каждый URL из posts/urls.py на самых тяжёлых данных.
+
+    Изменяющие запросы идут последними и откатываются.
+    """
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    group = Group.objects.order_by('-posts_count', 'pk').first()
+    counters = UserCounters.objects.select_related('user')
+    author = counters.order_by('-posts_count', 'pk').first()
+    reader = counters.order_by('-following_count', 'pk').first()
+    if None in (post, group, author, reader):
+        raise ValueError('Нет данных: сначала запустите generate_data')
+    author, reader = author.user, reader.user
+    suggested = list(counters.order_by('-followers_count', 'pk').values_list(
+        'user__username', flat=True
+    )[:FOLLOW_BATCH_SIZE // 2])
+    word = post.text.split()[0].strip('.,')
+    deep_page = max(Post.objects.count() // POSTS_ON_PAGE, 1)
+    return [
+        Scenario('index', reverse('posts:index')),
+        Scenario('index_deep_page',
+                 reverse('posts:index') + f'?page={deep_page}'),
+        Scenario('group_posts', reverse('posts:group_posts',
+                                        args=[group.slug])),
+        Scenario('profile', reverse('posts:profile',
+                                    args=[author.username])),
+        Scenario('post_detail', reverse('posts:post_detail',
+                                        args=[post.pk])),
+        Scenario('comments', reverse('posts:comments', args=[post.pk])),
+        Scenario('search', reverse('posts:search') + f'?q={word}'),
+        Scenario('follow_index', reverse('posts:follow_index'),
+                 user=reader),
+        Scenario('post_create', reverse('posts:post_create'), user=author),
+        Scenario('post_edit', reverse('posts:post_edit', args=[post.pk]),
+                 user=post.author),
+        Scenario('add_comment', reverse('posts:add_comment',
+                                        args=[post.pk]),
+                 user=reader, method='post', data={'text': 'Комментарий'}),
+        Scenario('profile_follow', reverse('posts:profile_follow',
+                                           args=[author.username]),
+                 user=reader, writes=True),
+        Scenario('profile_unfollow', reverse('posts:profile_unfollow',
+                                             args=[author.username]),
+                 user=reader, writes=True),
+        Scenario('profile_follow_many', reverse('posts:profile_follow_many'),
+                 user=reader, method='post',
+                 data={'username': suggested}),
+        Scenario('profile_unfollow_many',
+                 reverse('posts:profile_unfollow_many'),
+                 user=reader, method='post',
+                 data={'username': suggested}),
+    ]
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(int(len(values) * share), len(values) - 1)]
+
+
+def measure(scenario, repeat, cold=False):
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    send = getattr(client, scenario.method)
+    timings, queries = [], []
+    response = None
+    # Первый запрос прогревает кеш шаблонов и не учитывается.
+    for run in range(repeat + 1):
+        if cold:
+            cache.clear()
+        atomic = transaction.atomic() if scenario.writes else nullcontext()
+        with atomic, CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send(scenario.url, scenario.data)
+            elapsed = time.perf_counter() - started
+            if scenario.writes:
+                transaction.set_rollback(True)
+        if run:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+    return {
+        'url': scenario.url,
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': percentile(queries, 0.5),
+        'bytes': len(response.content),
+    }
+
+
+def run(repeat, cold=False, only=None):
+    results = {}
+    # Повторы изменяющих запросов иначе упрутся в RATE_LIMITS.
+    with override_settings(RATE_LIMITS={}):
+        for scenario in scenarios():
+            if only and scenario.name not in only:
+                continue
+            results[scenario.name] = measure(scenario, repeat, cold)
+    return {
+        'meta': {
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'cold_cache': cold,
+            'rows': {model.__name__.lower(): model.objects.count()
+                     for model in (User, Group, Post, Comment, Follow)},
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline):
+    """Отношение p50 и разница в запросах к прошлому прогону."""
+    changes = {}
+    for name, result in results['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        changes[name] = {
+            'p50_ratio': round(result['p50_ms'] / before['p50_ms'], 3)
+            if before['p50_ms'] else None,
+            'queries_delta': result['queries'] - before['queries'],
+            'bytes_delta': result['bytes'] - before['bytes'],
+        }
+    return changes
+
+
+def load(path):
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core import db
+
+GENERATION_KEY = 'generation:{}'
+
+
+def new_token():
+    return time.time_ns()
+
+
+def generation_tokens(*scopes):
+    keys = [GENERATION_KEY.format(scope) for scope in scopes]
+    tokens = cache.get_many(keys)
+    fresh_after = new_token() - settings.PRIMARY_STICKY_SECONDS * 10 ** 9
+    if any(token > fresh_after for token in tokens.values()):
+        # Токен — время bump(). Реплики могли ещё не получить эту запись,
+        # а всё, что закешируют по новой версии, проживёт часы.
+        db.read_primary()
+    for key in keys:
+        if key not in tokens:
+            token = new_token()
+            if not cache.add(key, token, None):
+                token = cache.get(key, token)
+            tokens[key] = token
+    return [tokens[key] for key in keys]
+
+
+def generation(*scopes):
+    """Версия содержимого областей scopes для ключей кеша.
+
+    Меняется при каждом bump() любой из областей.
+    """
+    return '-'.join(str(token) for token in generation_tokens(*scopes))
+
+
+def _set_generations(scopes):
+    cache.set_many(
+        {GENERATION_KEY.format(scope): new_token() for scope in scopes},
+        None
+    )
+
+
+def bump(*scopes):
+    _set_generations(scopes)
+    if connection.in_atomic_block:
+        # Повторно после коммита: иначе параллельный запрос может
+        # закешировать старые данные под новой версией.
+        transaction.on_commit(lambda: _set_generations(scopes))
@@ -0,0 +1,48 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'includes/post_card.html'
+CARD_KEY = 'post_card:{}:{}'
+
+
+def card_version(post, flags):
+    """Версия карточки: меняется вместе с любым полем, выводимым в ней.
+
+    Поэтому карточки не нужно сбрасывать сигналами, а устаревшие
+    просто вытесняются из кеша.
+    """
+    author = post.author
+    values = (
+        post.text, post.pub_date.isoformat(), post.image.name,
+        post.thumbnail.name, post.group.slug if post.group_id else None,
+        author.username, author.first_name, author.last_name, flags,
+    )
+    return hashlib.md5(repr(values).encode()).hexdigest()
+
+
+def render_cards(posts, **flags):
+    """Пары (пост, HTML карточки) в порядке posts.
+
+    Готовые карточки берутся из кеша одним get_many, рендерятся только
+    недостающие. flags — переменные шаблона карточки, например
+    show_all_group_posts_link; одинаковые карточки общие для всех лент.
+    """
+    posts = list(posts)
+    flags = tuple(sorted(flags.items()))
+    keys = [CARD_KEY.format(post.pk, card_version(post, flags))
+            for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    template = get_template(CARD_TEMPLATE)
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = cards[key] = str(
+                template.render({'post': post, **dict(flags)})
+            )
+    if missing:
+        cache.set_many(missing, settings.FEED_CACHE_TIMEOUT)
+    return [(post, mark_safe(cards[key])) for key, post in zip(keys, posts)]
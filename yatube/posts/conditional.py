@@ -0,0 +1,55 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+from django.views.decorators.http import condition
+
+from .caching import generation_tokens
+
+
+def client_key(request):
+    """Отпечаток сессии и CSRF-куки: страницы зависят от пользователя."""
+    cookies = '|'.join(
+        request.COOKIES.get(name, '')
+        for name in (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+    )
+    if cookies == '|':
+        return ''
+    return salted_hmac('posts.conditional', cookies).hexdigest()
+
+
+def validators(request, scopes_func, *args, **kwargs):
+    """ETag и Last-Modified страницы по версиям её областей кеша.
+
+    scopes_func возвращает области или None, если объекта нет: тогда
+    валидаторов нет и ответ строит сама view. Last-Modified не зависит
+    от зрителя, поэтому отдаётся только страницам без сессии и CSRF-куки.
+    """
+    cached = getattr(request, '_posts_validators', None)
+    if cached is not None:
+        return cached
+    scopes = scopes_func(request, *args, **kwargs)
+    etag = last_modified = None
+    if scopes is not None:
+        tokens = generation_tokens(*scopes)
+        key = client_key(request)
+        raw = '|'.join([request.get_full_path(), key]
+                       + [str(token) for token in tokens])
+        etag = hashlib.md5(raw.encode()).hexdigest()
+        if not key:
+            last_modified = datetime.fromtimestamp(max(tokens) / 10 ** 9,
+                                                   tz=timezone.utc)
+    request._posts_validators = etag, last_modified
+    return request._posts_validators
+
+
+def conditional(scopes_func):
+    """Поддержка условных GET-запросов (304) без рендера страницы."""
+    def etag(request, *args, **kwargs):
+        return validators(request, scopes_func, *args, **kwargs)[0]
+
+    def last_modified(request, *args, **kwargs):
+        return validators(request, scopes_func, *args, **kwargs)[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
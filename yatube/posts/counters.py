@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def increment(queryset, field, delta=1):
+    """Сдвигает счётчик на delta, не опуская его ниже нуля.
+
+    Строки, созданные через bulk_create, счётчик не увеличивали; их
+    удаление не должно нарушать CHECK >= 0 у PositiveIntegerField.
+    """
+    if delta > 0:
+        queryset.update(**{field: F(field) + delta})
+    elif delta < 0:
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def increment_many(queryset, field, deltas, key='pk'):
+    """Сдвигает счётчики строк на deltas (значение key -> сдвиг).
+
+    Строки с одинаковым сдвигом обновляются одним запросом.
+    """
+    keys = defaultdict(list)
+    for value, delta in deltas.items():
+        keys[delta].append(value)
+    for delta, values in keys.items():
+        increment(queryset.filter(**{f'{key}__in': values}), field, delta)
+
+
+def count_subquery(model, field, outer='pk'):
+    queryset = (model.objects.filter(**{field: OuterRef(outer)})
+                .order_by().values(field)
+                .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(queryset, output_field=IntegerField()), 0)
+
+
+def user_counters(user):
+    """Счётчики пользователя; недостающую строку создаёт по данным в базе.
+
+    Строки нет у пользователей из bulk_create и raw loaddata: сигнал
+    create_user_counters для них не срабатывает.
+    """
+    UserCounters = global_apps.get_model('posts', 'UserCounters')
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        pass
+    Follow = global_apps.get_model('posts', 'Follow')
+    counters, _ = UserCounters.objects.get_or_create(user=user, defaults={
+        'posts_count': user.posts.count(),
+        'followers_count': Follow.objects.filter(author=user).count(),
+        'following_count': Follow.objects.filter(user=user).count(),
+    })
+    user.counters = counters
+    return counters
+
+
+def recount(apps=global_apps):
+    """Пересчитывает все счётчики по данным в базе."""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    with transaction.atomic():
+        missing = User.objects.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True)
+        UserCounters.objects.bulk_create(
+            [UserCounters(user_id=pk) for pk in missing]
+        )
+        Group.objects.update(posts_count=count_subquery(Post, 'group'))
+        Post.objects.update(comments_count=count_subquery(Comment, 'post'))
+        UserCounters.objects.update(
+            posts_count=count_subquery(Post, 'author', 'user_id'),
+            followers_count=count_subquery(Follow, 'author', 'user_id'),
+            following_count=count_subquery(Follow, 'user', 'user_id'),
+        )
@@ -0,0 +1,249 @@
+import csv
+import json
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from posts import search, timeline
+from posts.counters import increment_many
+from posts.following import recount_follows
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+FORMATS = ('jsonl', 'csv')
+CHUNK_SIZE = 2000
+
+# Поля файла и соответствующие им поля values(); пользователи и группы
+# передаются по username и slug, посты и комментарии — со своими id.
+EXPORT_FIELDS = {
+    'groups': (Group, {
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'posts': (Post, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'image': 'image',
+    }),
+    'comments': (Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    'follows': (Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+}
+
+
+def export_rows(kind, chunk_size=CHUNK_SIZE):
+    """Строки для выгрузки; в памяти одновременно не больше chunk_size."""
+    model, fields = EXPORT_FIELDS[kind]
+    rows = model.objects.order_by('pk').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, row))
+
+
+def json_default(value):
+    # DjangoJSONEncoder обрезает микросекунды у дат.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def write_rows(rows, stream, file_format, fields):
+    if file_format == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=list(fields))
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    for row in rows:
+        stream.write(json.dumps(row, ensure_ascii=False,
+                                default=json_default) + '\n')
+
+
+def read_rows(stream, file_format):
+    if file_format == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+@contextmanager
+def keeping_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить даты из файла."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Importer:
+    """Загрузка строк пачками через bulk_create.
+
+    Пользователи и группы ищутся по словарям username -> id и slug -> id;
+    неизвестные пользователи создаются без пароля. bulk_create не шлёт
+    сигналов, поэтому счётчики, ленты и поисковый индекс обновляются
+    методами update_<kind> только для загруженных строк, а кеш страниц
+    сбрасывается после загрузки.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def user_ids(self, usernames):
+        missing = set(usernames) - self.users.keys()
+        if missing:
+            password = make_password(None)
+            User.objects.bulk_create(
+                [User(username=username, password=password)
+                 for username in missing],
+                batch_size=self.batch_size
+            )
+            self.users.update(User.objects.filter(
+                username__in=missing
+            ).values_list('username', 'pk'))
+            UserCounters.objects.bulk_create(
+                [UserCounters(user_id=self.users[username])
+                 for username in missing],
+                batch_size=self.batch_size
+            )
+        return self.users
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        try:
+            return self.groups[slug]
+        except KeyError:
+            raise ValueError(f'Неизвестная группа: {slug}')
+
+    def build_groups(self, rows):
+        return [Group(title=row['title'], slug=row['slug'],
+                      description=row['description']) for row in rows]
+
+    def build_posts(self, rows):
+        users = self.user_ids(row['author'] for row in rows)
+        return [Post(id=row.get('id') or None, text=row['text'],
+                     pub_date=row['pub_date'],
+                     author_id=users[row['author']],
+                     group_id=self.group_id(row.get('group')),
+                     image=row.get('image') or '') for row in rows]
+
+    def build_comments(self, rows):
+        users = self.user_ids(row['author'] for row in rows)
+        return [Comment(id=row.get('id') or None, post_id=row['post'],
+                        author_id=users[row['author']], text=row['text'],
+                        created=row['created']) for row in rows]
+
+    def build_follows(self, rows):
+        users = self.user_ids(
+            [row['user'] for row in rows] + [row['author'] for row in rows]
+        )
+        return [Follow(user_id=users[row['user']],
+                       author_id=users[row['author']]) for row in rows]
+
+    def update_posts(self, posts):
+        increment_many(Group.objects, 'posts_count', Counter(
+            post.group_id for post in posts if post.group_id
+        ))
+        increment_many(UserCounters.objects, 'posts_count', Counter(
+            post.author_id for post in posts
+        ), key='user_id')
+        timeline.fan_out_many(posts)
+        search.index_posts((post.pk, post.text) for post in posts)
+
+    def update_comments(self, comments):
+        increment_many(Post.objects, 'comments_count', Counter(
+            comment.post_id for comment in comments
+        ))
+
+    def update_follows(self, follows):
+        # ignore_conflicts пропускает существующие подписки, поэтому
+        # счётчики затронутых пользователей пересчитываются по базе.
+        authors = defaultdict(set)
+        for follow in follows:
+            authors[follow.user_id].add(follow.author_id)
+        recount_follows(
+            {*authors, *(follow.author_id for follow in follows)}
+        )
+        for user_id, author_ids in authors.items():
+            timeline.backfill_many(user_id, author_ids)
+
+    def load(self, kind, rows):
+        model = EXPORT_FIELDS[kind][0]
+        build = getattr(self, f'build_{kind}')
+        total = 0
+        with transaction.atomic(), keeping_dates(
+                Post._meta.get_field('pub_date'),
+                Comment._meta.get_field('created')):
+            for batch in batches(rows, self.batch_size):
+                objects = build(batch)
+                last_pk = model.objects.aggregate(last=Max('pk'))['last']
+                model.objects.bulk_create(objects,
+                                          ignore_conflicts=kind == 'follows')
+                if kind == 'posts':
+                    assign_pks(objects, last_pk or 0)
+                update = getattr(self, f'update_{kind}', None)
+                if update is not None:
+                    update(objects)
+                if kind == 'groups':
+                    self.groups.update(Group.objects.filter(
+                        slug__in=[group.slug for group in objects]
+                    ).values_list('slug', 'pk'))
+                total += len(objects)
+            reset_sequences(model)
+            transaction.on_commit(cache.clear)
+        return total
+
+
+def assign_pks(objects, last_pk):
+    """Проставляет id объектам, которым их выдала база при bulk_create.
+
+    Django 2.2 возвращает id из bulk_create только на PostgreSQL; новые
+    строки без id получают возрастающие id больше last_pk.
+    """
+    missing = [obj for obj in objects if obj.pk is None]
+    if not missing:
+        return
+    model = type(missing[0])
+    given = [obj.pk for obj in objects if obj.pk is not None]
+    pks = model.objects.filter(pk__gt=last_pk).exclude(
+        pk__in=given
+    ).order_by('pk').values_list('pk', flat=True)
+    for obj, pk in zip(missing, pks):
+        obj.pk = pk
+
+
+def reset_sequences(model):
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from posts import signals, timeline
+from posts.caching import bump, generation
+from posts.counters import count_subquery
+from posts.models import Follow, User, UserCounters
+
+FOLLOWED_KEY = 'followed_authors:{}:{}'
+FOLLOW_BATCH_SIZE = 100
+
+
+def followed_authors(user):
+    """id авторов, на которых подписан user, для проверок `in`.
+
+    Загружается одним запросом не чаще раза за запрос (запоминается на
+    объекте пользователя) и хранится в кеше до подписки или отписки.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    authors = getattr(user, '_followed_authors', None)
+    if authors is None:
+        key = FOLLOWED_KEY.format(user.pk,
+                                  generation(f'following:{user.pk}'))
+        authors = cache.get(key)
+        if authors is None:
+            authors = frozenset(Follow.objects.filter(
+                user_id=user.pk
+            ).values_list('author_id', flat=True))
+            cache.set(key, authors, settings.FEED_CACHE_TIMEOUT)
+        user._followed_authors = authors
+    return authors
+
+
+def author_ids(user, usernames):
+    return list(User.objects.filter(
+        username__in=set(usernames)
+    ).exclude(pk=user.pk).values_list('pk', flat=True))
+
+
+def recount_follows(user_ids):
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        followers_count=count_subquery(Follow, 'author', 'user_id'),
+        following_count=count_subquery(Follow, 'user', 'user_id'),
+    )
+
+
+def invalidate_follows(user, author_ids):
+    bump(f'following:{user.pk}',
+         *(f'followers:{author_id}' for author_id in author_ids))
+
+
+@transaction.atomic
+def follow_many(user, usernames):
+    """Подписывает user на авторов usernames; возвращает id новых.
+
+    bulk_create не отправляет сигналы, поэтому счётчики, ленты и
+    версии кеша обновляются здесь же, в той же транзакции. Счётчики
+    пересчитываются по базе: подписка, созданная параллельно и
+    пропущенная ignore_conflicts, не посчитается дважды.
+    """
+    authors = author_ids(user, usernames)
+    followed = set(Follow.objects.filter(
+        user=user, author_id__in=authors
+    ).values_list('author_id', flat=True))
+    created = [pk for pk in authors if pk not in followed]
+    if not created:
+        return []
+    Follow.objects.bulk_create(
+        [Follow(user=user, author_id=pk) for pk in created],
+        ignore_conflicts=True
+    )
+    recount_follows([user.pk, *created])
+    timeline.backfill_many(user.pk, created)
+    invalidate_follows(user, created)
+    return created
+
+
+@transaction.atomic
+def unfollow_many(user, usernames):
+    """Отписывает user от авторов usernames; возвращает id удалённых."""
+    follows = Follow.objects.filter(user=user,
+                                    author_id__in=author_ids(user, usernames))
+    removed = list(follows.values_list('author_id', flat=True))
+    if not removed:
+        return []
+    # Сигналы на каждую подписку не нужны: всё пересчитывается ниже.
+    with signals.muted():
+        follows.delete()
+    recount_follows([user.pk, *removed])
+    timeline.prune(user.pk, *removed)
+    timeline.schedule_refill(removed)
+    invalidate_follows(user, removed)
+    return removed
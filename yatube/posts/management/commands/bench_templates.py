@@ -0,0 +1,72 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.template import engines
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from core.template_profiler import profile_templates
+from posts.benchmark import percentile
+from posts.models import Post
+from posts.paginator import paginate
+
+SIZES = (10, 50, 200)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендер posts/index.html для страниц из 10, 50 и 200 '
+            'постов и показывает время по шаблонам и include.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--template', default='posts/index.html')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help=('Сбрасывать кеш скомпилированных шаблонов и карточек постов '
+                  'перед рендером.')
+        )
+
+    def reset_loaders(self):
+        for loader in engines['django'].engine.template_loaders:
+            if hasattr(loader, 'reset'):
+                loader.reset()
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.for_feed()[:max(options['sizes'])])
+        if not posts:
+            raise CommandError('Нет постов: сначала запустите generate_data')
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        for size in options['sizes']:
+            page = (posts * (size // len(posts) + 1))[:size]
+            context = {
+                'page_obj': paginate(page, 1, size),
+                # Фрагментный кеш выключен: замеряется именно рендер.
+                'cache_timeout': 0,
+                'cache_version': '',
+            }
+            timings = []
+            for _ in range(options['repeat'] + 1):
+                if options['cold']:
+                    self.reset_loaders()
+                    cache.clear()
+                started = time.perf_counter()
+                get_template(options['template']).render(context, request)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings = timings[1:]
+            if options['cold']:
+                cache.clear()
+            with profile_templates() as profile:
+                get_template(options['template']).render(context, request)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{size} постов: p50 {percentile(timings, 0.5):.2f} мс, '
+                f'p95 {percentile(timings, 0.95):.2f} мс'
+            ))
+            for row in profile.rows():
+                self.stdout.write(
+                    f'  {row["template"]:<40}{row["calls"]:>5}'
+                    f'{row["own_ms"]:>10.3f}{row["total_ms"]:>10.3f}'
+                )
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Замеряет p50/p95, число запросов и размер ответа для каждого '
+            'URL приложения posts и сохраняет результат в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--only', nargs='+', metavar='NAME')
+        parser.add_argument('--output', '-o',
+                            help='Файл для результатов в JSON.')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON прошлого прогона для сравнения.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        try:
+            results = benchmark.run(options['repeat'], options['cold'],
+                                    options['only'])
+        except ValueError as error:
+            raise CommandError(error)
+        changes = {}
+        if options['compare']:
+            changes = benchmark.compare(results,
+                                        benchmark.load(options['compare']))
+            results['compare'] = changes
+        self.stdout.write(f'{"view":<18}{"status":>7}{"p50 ms":>10}'
+                          f'{"p95 ms":>10}{"queries":>9}{"bytes":>9}'
+                          f'{"p50 x":>8}')
+        for name, result in results['results'].items():
+            ratio = changes.get(name, {}).get('p50_ratio')
+            self.stdout.write(
+                f'{name:<18}{result["status"]:>7}{result["p50_ms"]:>10}'
+                f'{result["p95_ms"]:>10}{result["queries"]:>9}'
+                f'{result["bytes"]:>9}{ratio if ratio else "":>8}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
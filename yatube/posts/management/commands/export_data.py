@@ -0,0 +1,33 @@
+
+from django.core.management.base import BaseCommand
+
+from posts.exchange import (
+    CHUNK_SIZE, EXPORT_FIELDS, FORMATS, export_rows, write_rows,
+)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии или подписки в JSONL '
+            'или CSV, не загружая таблицу в память целиком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORT_FIELDS)
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output', '-o',
+                            help='Файл для выгрузки, по умолчанию stdout.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        rows = export_rows(kind, options['chunk_size'])
+        fields = EXPORT_FIELDS[kind][1]
+        if options['output'] is None:
+            write_rows(rows, self.stdout, options['format'], fields)
+            return
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as stream:
+            write_rows(rows, stream, options['format'], fields)
+        if options['verbosity']:
+            self.stderr.write(self.style.SUCCESS(
+                f'Выгружено в {options["output"]}'
+            ))
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class RollbackPlans(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Выводит планы запросов лент. С --compare показывает также '
+            'планы без индексов лент (индексы удаляются в откатываемой '
+            'транзакции).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compare', action='store_true')
+
+    def feed_queries(self):
+        group = Group.objects.first()
+        user = User.objects.first()
+        post = Post.objects.first()
+        group_id = group.pk if group else 0
+        user_id = user.pk if user else 0
+        post_id = post.pk if post else 0
+        return {
+            'index': Post.objects.for_feed(),
+            'group_posts': Post.objects.for_feed().filter(group_id=group_id),
+            'profile': Post.objects.for_feed().filter(author_id=user_id),
+            'follow_index': Post.objects.for_feed().filter(
+                author__following__user_id=user_id
+            ),
+            'comments': Comment.objects.filter(post_id=post_id),
+            'following': Follow.objects.filter(user_id=user_id,
+                                               author_id=user_id),
+        }
+
+    def print_plans(self, title):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in self.feed_queries().items():
+            plan = queryset[:10].explain()
+            sorts = 'TEMP B-TREE' in plan or 'Sort' in plan
+            self.stdout.write(
+                f'{name}: {"sort" if sorts else "index scan"}'
+            )
+            self.stdout.write(plan)
+
+    def handle(self, *args, **options):
+        self.print_plans('С индексами лент')
+        if not options['compare']:
+            return
+        # Новое соединение: иначе sqlite3 вернёт закешированные планы.
+        connection.close()
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                for model in (Post, Comment, Follow):
+                    for index in model._meta.indexes:
+                        cursor.execute('DROP INDEX %s' % (
+                            connection.ops.quote_name(index.name)
+                        ))
+                self.print_plans('Без индексов лент')
+                raise RollbackPlans
+        except RollbackPlans:
+            pass
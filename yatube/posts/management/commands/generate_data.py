@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts.benchmark import SKEW, DataGenerator
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=1000)
+        parser.add_argument('--skew', type=float, default=SKEW,
+                            help='Показатель распределения Ципфа.')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        generator = DataGenerator(options['seed'], options['skew'])
+        created = generator.generate(
+            **{kind: options[kind] for kind in
+               ('users', 'groups', 'posts', 'comments', 'follows')}
+        )
+        for kind, count in created.items():
+            self.stdout.write(f'{kind}: {count}')
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для постов с картинкой, но без миниатюры.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            thumbnail=''
+        ).values_list('pk', flat=True)
+        for post_id in list(posts):
+            generate_thumbnail(post_id)
+        self.stdout.write(self.style.SUCCESS('Миниатюры построены'))
@@ -0,0 +1,41 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.exchange import (
+    CHUNK_SIZE, EXPORT_FIELDS, FORMATS, Importer, read_rows,
+)
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии или подписки из JSONL '
+            'или CSV пачками через bulk_create в одной транзакции. '
+            'Порядок загрузки: groups, posts, comments, follows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=EXPORT_FIELDS)
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lstrip('.')
+            file_format = extension if extension in FORMATS else 'jsonl'
+        importer = Importer(options['batch_size'])
+        try:
+            if path == '-':
+                total = importer.load(options['kind'],
+                                      read_rows(sys.stdin, file_format))
+            else:
+                with open(path, encoding='utf-8', newline='') as stream:
+                    total = importer.load(options['kind'],
+                                          read_rows(stream, file_format))
+        except (KeyError, ValueError, IntegrityError) as error:
+            raise CommandError(f'Загрузка отменена: {error!r}')
+        self.stdout.write(self.style.SUCCESS(f'Загружено записей: {total}'))
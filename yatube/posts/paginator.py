@@ -1,9 +1,183 @@
+from collections.abc import Sequence
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 
 POSTS_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+PAGES_ON_EACH_SIDE = 2
+PAGES_ON_ENDS = 1
+ELLIPSIS = None
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
 
 
-def paginate(post_list, page_number, posts_on_page=POSTS_ON_PAGE):
+def paginate(post_list, page_number, posts_on_page=POSTS_ON_PAGE,
+             cursor=None, count=None):
+    if cursor is not None:
+        paginator = CursorPaginator(post_list, posts_on_page)
+        return paginator.get_page(cursor)
     paginator = Paginator(post_list, posts_on_page)
+    if count is not None:
+        paginator.count = count
     page_obj = paginator.get_page(page_number)
+    page_obj.elided_page_range = list(
+        elided_page_range(page_obj.number, paginator.num_pages)
+    )
     return page_obj
+
+
+def elided_page_range(number, num_pages, on_each_side=PAGES_ON_EACH_SIDE,
+                      on_ends=PAGES_ON_ENDS):
+    """Номера страниц вокруг текущей, первые и последние.
+
+    Пропуски между ними обозначены ELLIPSIS.
+    """
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from range(1, num_pages + 1)
+        return
+    if number > on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield ELLIPSIS
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield ELLIPSIS
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+def encode_cursor(direction, position):
+    value, pk = position
+    raw = f'{direction}{value.isoformat()}|{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Разбирает токен курсора; для битого токена возвращает None."""
+    try:
+        raw = urlsafe_base64_decode(cursor).decode()
+        direction, raw = raw[0], raw[1:]
+        value, pk = raw.rsplit('|', 1)
+        value, pk = parse_datetime(value), int(pk)
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or value is None:
+        return None
+    return direction, (value, pk)
+
+
+class CursorPaginator:
+    """Пагинация по ключу (order_field, id) без COUNT(*) и OFFSET."""
+
+    def __init__(self, object_list, per_page, order_field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.order_field = order_field
+
+    def position(self, obj):
+        if isinstance(obj, dict):
+            return obj[self.order_field], obj['id']
+        return getattr(obj, self.order_field), obj.pk
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor) if cursor else None
+        keyset = getattr(self.object_list, 'keyset', None)
+        if keyset is not None:
+            # Источник сам выбирает страницу по ключу (см. FollowFeed).
+            position, backwards = None, False
+            if decoded is not None:
+                direction, position = decoded
+                backwards = direction == CURSOR_PREVIOUS
+            return CursorPage(keyset(self.per_page + 1, position, backwards),
+                              self, cursor if decoded else '',
+                              backwards=backwards)
+        field = self.order_field
+        if decoded is None:
+            queryset = self.object_list.order_by(f'-{field}', '-id')
+            return CursorPage(queryset[:self.per_page + 1], self, '')
+        direction, (value, pk) = decoded
+        if direction == CURSOR_NEXT:
+            queryset = self.object_list.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk})
+            ).order_by(f'-{field}', '-id')
+            return CursorPage(queryset[:self.per_page + 1], self, cursor)
+        queryset = self.object_list.filter(
+            Q(**{f'{field}__gt': value})
+            | Q(**{field: value, 'id__gt': pk})
+        ).order_by(field, 'id')
+        return CursorPage(queryset[:self.per_page + 1], self, cursor,
+                          backwards=True)
+
+
+class CursorPage(Sequence):
+    """Страница курсорной пагинации с интерфейсом, близким к Page.
+
+    Запрос к базе выполняется при первом обращении к элементам.
+    """
+
+    is_cursor = True
+
+    def __init__(self, queryset, paginator, cursor, backwards=False):
+        self.queryset = queryset
+        self.paginator = paginator
+        self.number = cursor
+        self.backwards = backwards
+
+    def __repr__(self):
+        return f'<Cursor page {self.number!r}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @cached_property
+    def _fetched(self):
+        items = list(self.queryset)
+        has_more = len(items) > self.paginator.per_page
+        items = items[:self.paginator.per_page]
+        if self.backwards:
+            items.reverse()
+        return items, has_more
+
+    @property
+    def object_list(self):
+        return self._fetched[0]
+
+    def has_next(self):
+        if not self.object_list:
+            return False
+        return self.backwards or self._fetched[1]
+
+    def has_previous(self):
+        if not self.object_list:
+            return False
+        return self._fetched[1] if self.backwards else bool(self.number)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return encode_cursor(CURSOR_NEXT,
+                             self.paginator.position(self.object_list[-1]))
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return encode_cursor(CURSOR_PREVIOUS,
+                             self.paginator.position(self.object_list[0]))
@@ -0,0 +1,173 @@
+import math
+import re
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Sum, When
+
+from posts.stemmer import stem
+
+SEARCH_TABLE = 'posts_search'
+RESULTS_LIMIT = 1000
+BATCH_SIZE = 500
+TERM_LENGTH = 100
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-яё]')
+
+
+def terms(text):
+    """Основы слов текста в порядке следования."""
+    return [
+        (stem(word) if CYRILLIC_RE.search(word) else word)[:TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+    ]
+
+
+@lru_cache(maxsize=None)
+def fts5_available():
+    try:
+        sqlite3.connect(':memory:').execute(
+            'CREATE VIRTUAL TABLE probe USING fts5(body)'
+        )
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def use_fts(schema_connection=connection):
+    """FTS5 для SQLite, если не выбран индекс на моделях."""
+    backend = settings.POSTS_SEARCH_BACKEND
+    if backend == 'auto':
+        return schema_connection.vendor == 'sqlite' and fts5_available()
+    return backend == 'fts5'
+
+
+def create_fts_table(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite' and fts5_available():
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(body)'
+        )
+
+
+def drop_fts_table(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite' and fts5_available():
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+def fts_query(query_terms):
+    return ' '.join('"{}"'.format(term.replace('"', '""'))
+                    for term in dict.fromkeys(query_terms))
+
+
+def index_post(post_id, text):
+    """Заменяет слова поста в индексе."""
+    remove_post(post_id)
+    post_terms = terms(text)
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)',
+                [post_id, ' '.join(post_terms)]
+            )
+        return
+    SearchTerm = global_apps.get_model('posts', 'SearchTerm')
+    SearchTerm.objects.bulk_create([
+        SearchTerm(term=term, post_id=post_id, frequency=frequency)
+        for term, frequency in Counter(post_terms).items()
+    ])
+
+
+def remove_post(post_id):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s',
+                           [post_id])
+        return
+    SearchTerm = global_apps.get_model('posts', 'SearchTerm')
+    SearchTerm.objects.filter(post_id=post_id).delete()
+
+
+def search_ids(query, limit=RESULTS_LIMIT):
+    """id постов, подходящих под все слова запроса, от лучших к худшим."""
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {SEARCH_TABLE} '
+                f'WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+                [fts_query(query_terms), limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+    return _ranked_ids(set(query_terms), limit)
+
+
+def _ranked_ids(query_terms, limit):
+    """Ранжирование по TF-IDF для индекса на моделях."""
+    SearchTerm = global_apps.get_model('posts', 'SearchTerm')
+    Post = global_apps.get_model('posts', 'Post')
+    frequencies = dict(
+        SearchTerm.objects.filter(term__in=query_terms).values(
+            'term'
+        ).annotate(posts=Count('post')).values_list('term', 'posts')
+    )
+    if len(frequencies) < len(query_terms):
+        return []
+    total = Post.objects.count()
+    weights = [
+        When(term=term, then=F('frequency') * math.log(1 + total / posts))
+        for term, posts in frequencies.items()
+    ]
+    return list(
+        SearchTerm.objects.filter(term__in=query_terms).values(
+            'post_id'
+        ).annotate(
+            matched=Count('term'),
+            score=Sum(Case(*weights, output_field=FloatField())),
+        ).filter(matched=len(query_terms)).order_by(
+            '-score', '-post_id'
+        ).values_list('post_id', flat=True)[:limit]
+    )
+
+
+def index_posts(posts, apps=global_apps, schema_connection=connection):
+    """Добавляет в индекс посты (пары id, текст), которых в нём ещё нет."""
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    if use_fts(schema_connection):
+        with schema_connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, body) VALUES (%s, %s)',
+                ((pk, ' '.join(terms(text))) for pk, text in posts)
+            )
+        return
+    batch = []
+    for pk, text in posts:
+        batch.extend(
+            SearchTerm(term=term, post_id=pk, frequency=frequency)
+            for term, frequency in Counter(terms(text)).items()
+        )
+        if len(batch) >= BATCH_SIZE:
+            SearchTerm.objects.bulk_create(batch)
+            batch = []
+    SearchTerm.objects.bulk_create(batch)
+
+
+def rebuild(apps=global_apps, schema_connection=connection):
+    """Заново строит поисковый индекс по всем постам."""
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    posts = Post.objects.values_list('pk', 'text').iterator(
+        chunk_size=BATCH_SIZE
+    )
+    with transaction.atomic(using=schema_connection.alias):
+        if use_fts(schema_connection):
+            with schema_connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        else:
+            SearchTerm.objects.all().delete()
+        index_posts(posts, apps, schema_connection)
@@ -0,0 +1,225 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from posts import search, timeline
+from posts.caching import bump
+from posts.counters import increment
+from posts.models import Comment, Follow, Group, Post, User, UserCounters
+
+AUTHOR_FIELDS = ('username', 'first_name', 'last_name')
+
+_muted = threading.local()
+
+
+@contextmanager
+def muted():
+    """Отключает в текущем потоке обработчики сигналов подписок.
+
+    Для массовых операций, которые сами пересчитывают счётчики, ленты и
+    версии кеша, как загрузка через bulk_create.
+    """
+    _muted.active = True
+    try:
+        yield
+    finally:
+        _muted.active = False
+
+
+def is_muted():
+    return getattr(_muted, 'active', False)
+
+
+def change_post_counters(author_id, group_id, delta):
+    increment(UserCounters.objects.filter(user_id=author_id),
+              'posts_count', delta)
+    if group_id is not None:
+        increment(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owners(sender, instance, raw=False, **kwargs):
+    instance._saved_owners = None
+    if instance.pk and not raw:
+        instance._saved_owners = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('author_id', 'group_id').first()
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    owners = (instance.author_id, instance.group_id)
+    saved_owners = getattr(instance, '_saved_owners', None)
+    if created or saved_owners is None:
+        change_post_counters(*owners, 1)
+        timeline.fan_out(instance)
+    elif saved_owners != owners:
+        change_post_counters(*saved_owners, -1)
+        change_post_counters(*owners, 1)
+        if saved_owners[0] != instance.author_id:
+            old_readers = timeline.readers(instance.pk)
+            instance.timeline_entries.all().delete()
+            timeline.touch(old_readers)
+            timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_post_counters(instance.author_id, instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(Post.objects.filter(pk=instance.post_id),
+                  'comments_count')
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    increment(Post.objects.filter(pk=instance.post_id),
+              'comments_count', -1)
+
+
+def change_follow_counters(follow, delta):
+    increment(UserCounters.objects.filter(user_id=follow.author_id),
+              'followers_count', delta)
+    increment(UserCounters.objects.filter(user_id=follow.user_id),
+              'following_count', delta)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_follow_counters(instance, 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    if is_muted():
+        return
+    change_follow_counters(instance, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.schedule_refill([instance.author_id])
+
+
+def invalidate_post(post_id, *owners):
+    # Ленты подписок версионируются по своим записям (timeline:<id>):
+    # новый пост меняет их при раскладке, правка и удаление — через
+    # readers(), а посты популярных авторов — через author:<id>.
+    scopes = {'index', f'post:{post_id}'}
+    for author_id, group_id in owners:
+        scopes.add(f'author:{author_id}')
+        if group_id is not None:
+            scopes.add(f'group:{group_id}')
+    bump(*scopes)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    owners = {(instance.author_id, instance.group_id)}
+    saved_owners = getattr(instance, '_saved_owners', None)
+    if saved_owners is not None:
+        owners.add(saved_owners)
+    invalidate_post(instance.pk, *owners)
+    if not created:
+        timeline.touch(timeline.readers(instance.pk))
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_readers(sender, instance, **kwargs):
+    # Записи ленты удаляются каскадом раньше post_delete.
+    instance._timeline_readers = timeline.readers(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    invalidate_post(instance.pk, (instance.author_id, instance.group_id))
+    timeline.touch(getattr(instance, '_timeline_readers', []))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(f'post:{instance.post_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump('groups', f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, raw=False, **kwargs):
+    if not raw and not is_muted():
+        bump(f'following:{instance.user_id}',
+             f'followers:{instance.author_id}')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_names(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    instance._saved_names = None
+    if (raw or not instance.pk or update_fields is not None
+            and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    instance._saved_names = User.objects.filter(
+        pk=instance.pk
+    ).values_list(*AUTHOR_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, raw=False, **kwargs):
+    """Имя автора выводится в лентах, на странице поста и в комментариях."""
+    saved_names = getattr(instance, '_saved_names', None)
+    if created or raw or saved_names is None:
+        return
+    if saved_names == tuple(getattr(instance, field)
+                            for field in AUTHOR_FIELDS):
+        return
+    scopes = {'index', f'author:{instance.pk}'}
+    groups = Post.objects.filter(
+        author=instance, group__isnull=False
+    ).values_list('group_id', flat=True).distinct()
+    scopes.update(f'group:{group_id}' for group_id in groups)
+    commented = Comment.objects.filter(
+        author=instance
+    ).values_list('post_id', flat=True).distinct()
+    scopes.update(f'post:{post_id}' for post_id in commented)
+    bump(*scopes)
+    if not timeline.is_heavy(instance.pk):
+        timeline.touch(Follow.objects.filter(
+            author=instance
+        ).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    if raw or (update_fields is not None and 'text' not in update_fields):
+        return
+    search.index_post(instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
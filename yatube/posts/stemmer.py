@@ -0,0 +1,106 @@
+"""Стеммер Snowball для русского языка.
+
+Алгоритм: https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _suffixes(*groups):
+    """Окончания по убыванию длины с признаком «после а или я»."""
+    suffixes = [(suffix, after_a) for after_a, group in groups
+                for suffix in group]
+    return sorted(suffixes, key=lambda item: len(item[0]), reverse=True)
+
+
+PERFECTIVE_GERUND = _suffixes(
+    (True, ('в', 'вши', 'вшись')),
+    (False, ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')),
+)
+ADJECTIVE = _suffixes((False, (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)))
+PARTICIPLE = _suffixes(
+    (True, ('ем', 'нн', 'вш', 'ющ', 'щ')),
+    (False, ('ивш', 'ывш', 'ующ')),
+)
+REFLEXIVE = _suffixes((False, ('ся', 'сь')))
+VERB = _suffixes(
+    (True, ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+            'ет', 'ют', 'ны', 'ть', 'ешь', 'нно')),
+    (False, ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+             'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+             'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую',
+             'ю')),
+)
+NOUN = _suffixes((False, (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)))
+SUPERLATIVE = _suffixes((False, ('ейш', 'ейше')))
+DERIVATIONAL = _suffixes((False, ('ост', 'ость')))
+
+
+def _region(word, start=0):
+    """Начало области после первой пары «гласная — согласная»."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, suffixes):
+    """Отрезает самое длинное окончание; None, если его нет."""
+    for suffix, after_a in suffixes:
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if after_a and not stem.endswith(('а', 'я')):
+                return None
+            return stem
+    return None
+
+
+def _step1(rv):
+    stem = _strip(rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    reflexive = _strip(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    stem = _strip(rv, ADJECTIVE)
+    if stem is not None:
+        participle = _strip(stem, PARTICIPLE)
+        return stem if participle is None else participle
+    stem = _strip(rv, VERB)
+    if stem is not None:
+        return stem
+    stem = _strip(rv, NOUN)
+    return rv if stem is None else stem
+
+
+def stem(word):
+    """Основа русского слова в нижнем регистре."""
+    word = word.replace('ё', 'е')
+    start = next((i + 1 for i, char in enumerate(word) if char in VOWELS),
+                 len(word))
+    r2 = _region(word, _region(word))
+    rv = _step1(word[start:])
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _strip(rv, DERIVATIONAL)
+    if derivational is not None and start + len(derivational) >= r2:
+        rv = derivational
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _strip(rv, SUPERLATIVE)
+        if superlative is not None:
+            rv = superlative
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return word[:start] + rv
@@ -0,0 +1,13 @@
+from jobs.queue import task
+from posts import timeline
+from posts.thumbnails import process_image
+
+
+@task('posts.process_image')
+def process_post_image(post_id):
+    process_image(post_id)
+
+
+@task('posts.refill_timelines')
+def refill_timelines(author_id):
+    timeline.refill(author_id)
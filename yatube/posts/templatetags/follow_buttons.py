@@ -0,0 +1,60 @@
+import re
+from collections import namedtuple
+
+from django import template
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from posts.following import followed_authors
+
+register = template.Library()
+
+BUTTON_TEMPLATE = 'includes/follow_button.html'
+SLOT = '<!--follow-button:{}:{}-->'
+SLOT_RE = re.compile(r'<!--follow-button:(\d+):([\w.@+-]+)-->')
+
+Author = namedtuple('Author', 'pk username')
+
+
+@register.simple_tag
+def follow_button_slot(author):
+    """Место кнопки подписки внутри общего для всех закешированного HTML."""
+    return mark_safe(SLOT.format(author.pk, author.username))
+
+
+@register.tag
+def follow_buttons(parser, token):
+    """Подставляет кнопки подписки зрителя в места follow_button_slot.
+
+    Содержимое блока (обычно {% cache %} со списком карточек) не зависит
+    от зрителя и кешируется одно на всех; для каждого запроса
+    рендерятся только кнопки.
+    """
+    nodelist = parser.parse(('endfollow_buttons',))
+    parser.delete_first_token()
+    return FollowButtonsNode(nodelist)
+
+
+class FollowButtonsNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        html = self.nodelist.render(context)
+        user = context.get('user')
+        if user is None or not user.is_authenticated:
+            return SLOT_RE.sub('', html)
+        button = get_template(BUTTON_TEMPLATE)
+        following = followed_authors(user)
+        buttons = {}
+
+        def render_button(match):
+            if match.group() not in buttons:
+                buttons[match.group()] = button.render({
+                    'author': Author(int(match.group(1)), match.group(2)),
+                    'user': user,
+                    'followed_authors': following,
+                })
+            return buttons[match.group()]
+
+        return mark_safe(SLOT_RE.sub(render_button, html))
@@ -0,0 +1,71 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..benchmark import DataGenerator, scenarios
+from ..models import Comment, Follow, Group, Post, User, UserCounters
+from ..urls import urlpatterns
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.created = DataGenerator(seed=1).generate(
+            users=20, groups=3, posts=200, comments=300, follows=40
+        )
+
+    def test_generate_data(self):
+        """Генератор создаёт данные с перекосом и пересчитывает счётчики"""
+        self.assertEqual(self.created, {'users': 20, 'groups': 3,
+                                        'posts': 200, 'comments': 300,
+                                        'follows': 40})
+        self.assertEqual(
+            (User.objects.count(), Group.objects.count(),
+             Post.objects.count(), Comment.objects.count(),
+             Follow.objects.count()),
+            (20, 3, 200, 300, 40)
+        )
+        posts_counts = sorted(
+            UserCounters.objects.values_list('posts_count', flat=True)
+        )
+        self.assertEqual(sum(posts_counts), 200)
+        self.assertGreater(posts_counts[-1], 4 * posts_counts[10])
+
+    def test_scenarios_cover_urls(self):
+        """Замеряется каждый URL приложения posts"""
+        self.assertEqual({scenario.name for scenario in scenarios()}
+                         - {'index_deep_page'},
+                         {pattern.name for pattern in urlpatterns})
+
+    def test_bench_views(self):
+        """Результаты пишутся в JSON и сравниваются с прошлым прогоном"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('bench_views', repeat=2, output=path,
+                         stdout=StringIO())
+            call_command('bench_views', repeat=1, cold=True,
+                         only=['index'], output=path, compare=path,
+                         stdout=StringIO())
+            with open(path, encoding='utf-8') as stream:
+                results = json.load(stream)
+        self.assertEqual(list(results['results']), ['index'])
+        self.assertEqual(results['results']['index']['status'], 200)
+        self.assertEqual(results['meta']['rows']['post'], 200)
+        self.assertIn('p50_ratio', results['compare']['index'])
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 40)
+
+    def test_bench_templates(self):
+        """Рендер ленты замеряется с разбивкой по шаблонам"""
+        out = StringIO()
+        call_command('bench_templates', repeat=1, sizes=[10, 50],
+                     cold=True, stdout=out)
+        output = out.getvalue()
+        self.assertIn('10 постов', output)
+        self.assertIn('50 постов', output)
+        self.assertRegex(output, r'includes/post_card\.html\s+50\s')
@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core.template_profiler import profile_templates
+
+from ..cards import CARD_TEMPLATE, render_cards
+from ..models import Group, Post, User
+
+
+class PostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='carder')
+        cls.group = Group.objects.create(title='Группа', slug='cards',
+                                         description='Описание')
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {number}')
+            for number in range(5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, **flags):
+        with profile_templates() as profile:
+            cards = [card for _, card in
+                     render_cards(Post.objects.for_feed(), **flags)]
+        rendered = {row['template']: row['calls'] for row in profile.rows()}
+        return cards, rendered.get(CARD_TEMPLATE, 0)
+
+    def test_only_new_card_rendered(self):
+        """После нового поста рендерится только его карточка"""
+        cards, rendered = self.render()
+        self.assertEqual((len(cards), rendered), (5, 5))
+        Post.objects.create(author=self.user, text='Новый пост')
+        cards, rendered = self.render()
+        self.assertEqual((len(cards), rendered), (6, 1))
+        self.assertIn('Новый пост', cards[0])
+
+    def test_changes_render_card_again(self):
+        """Правка поста или имени автора даёт новую версию карточки"""
+        self.render()
+        Post.objects.filter(text='Пост 0').update(text='Исправленный пост')
+        cards, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('Исправленный пост', cards[-1])
+        User.objects.filter(pk=self.user.pk).update(first_name='Лев')
+        cards, rendered = self.render()
+        self.assertEqual(rendered, 5)
+        self.assertIn('Лев', cards[0])
+
+    def test_flags_are_separate_cards(self):
+        """Карточки с разными переменными шаблона кешируются отдельно"""
+        cards, _ = self.render()
+        self.assertNotIn('все записи группы', cards[0])
+        cards, rendered = self.render(show_all_group_posts_link=True)
+        self.assertEqual(rendered, 5)
+        self.assertIn('все записи группы', cards[0])
+
+    def test_feeds_share_cards(self):
+        """Ленты разделяют карточки и разделяют их <hr>"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content.decode().count('<hr>'), 4)
+        with profile_templates() as profile:
+            self.client.get(reverse('posts:profile', args=[self.user]))
+        rendered = {row['template'] for row in profile.rows()}
+        self.assertNotIn(CARD_TEMPLATE, rendered)
@@ -0,0 +1,147 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, User, UserCounters,
+)
+from ..search import search_ids
+
+KINDS = ('groups', 'posts', 'comments', 'follows')
+
+
+class ExchangeCommandsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='exchange',
+                                         description='Описание, "в кавычках"')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост про жирафов\nи слонов')
+        Post.objects.create(author=cls.author, text='Пост без группы')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def snapshot(self):
+        return {
+            'groups': list(Group.objects.values_list(
+                'slug', 'title', 'description', 'posts_count')),
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group__slug',
+                'comments_count')),
+            'comments': list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created')),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username')),
+        }
+
+    def round_trip(self, file_format):
+        expected = self.snapshot()
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {kind: os.path.join(directory, f'{kind}.{file_format}')
+                     for kind in KINDS}
+            for kind, path in paths.items():
+                call_command('export_data', kind, output=path,
+                             format=file_format, chunk_size=1, verbosity=0)
+            Post.objects.all().delete()
+            Group.objects.all().delete()
+            User.objects.exclude(username='writer').delete()
+            for kind, path in paths.items():
+                call_command('import_data', kind, path, batch_size=1,
+                             stdout=StringIO())
+        self.assertEqual(self.snapshot(), expected)
+        reader = User.objects.get(username='reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(
+            UserCounters.objects.get(user=reader).following_count, 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 2
+        )
+        self.assertEqual(search_ids('слоны'), [self.post.pk])
+
+    def test_jsonl_round_trip(self):
+        """Выгрузка и загрузка JSONL сохраняют данные и даты"""
+        self.round_trip('jsonl')
+
+    def test_csv_round_trip(self):
+        """Выгрузка и загрузка CSV сохраняют данные и даты"""
+        self.round_trip('csv')
+
+    def test_export_to_stdout(self):
+        """Без --output строки пишутся в stdout"""
+        out = StringIO()
+        call_command('export_data', 'follows', stdout=out)
+        self.assertEqual(out.getvalue(),
+                         '{"user": "reader", "author": "writer"}\n')
+
+    def import_file(self, kind, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl',
+                                         delete=False) as stream:
+            stream.write(content)
+        self.addCleanup(os.remove, stream.name)
+        call_command('import_data', kind, stream.name, batch_size=1,
+                     stdout=StringIO())
+
+    def test_import_updates_only_loaded_rows(self):
+        """Загрузка обновляет счётчики, ленты и индекс только для новых
+        строк, не пересобирая их целиком"""
+        other = Group.objects.create(title='Другая', slug='other')
+        Group.objects.filter(pk=other.pk).update(posts_count=5)
+        self.import_file(
+            'posts',
+            '{"text": "Пост про бегемотов", "pub_date": '
+            '"2023-01-01T00:00:00Z", "author": "writer", '
+            '"group": "exchange"}\n'
+            '{"text": "Пост новичка", "pub_date": "2023-01-02T00:00:00Z", '
+            '"author": "newcomer"}\n'
+        )
+        imported = Post.objects.get(text='Пост про бегемотов')
+        self.assertEqual(search_ids('бегемоты'), [imported.pk])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=imported
+        ).exists())
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 2)
+        self.assertEqual(Group.objects.get(pk=other.pk).posts_count, 5)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(
+            UserCounters.objects.get(user__username='newcomer').posts_count,
+            1
+        )
+        self.import_file(
+            'follows',
+            '{"user": "newcomer", "author": "writer"}\n'
+            '{"user": "reader", "author": "writer"}\n'
+        )
+        newcomer = User.objects.get(username='newcomer')
+        self.assertEqual(newcomer.counters.following_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).followers_count, 2
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=newcomer).count(),
+            Post.objects.filter(author=self.author).count()
+        )
+
+    def test_failed_import_is_rolled_back(self):
+        """Ошибка в файле отменяет всю загрузку"""
+        posts_count = Post.objects.count()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl',
+                                         delete=False) as stream:
+            stream.write('{"text": "Пост", "pub_date": "2023-01-01T00:00:00'
+                         'Z", "author": "writer"}\n'
+                         '{"text": "Пост", "pub_date": "2023-01-01T00:00:00'
+                         'Z", "author": "writer", "group": "missing"}\n')
+        self.addCleanup(os.remove, stream.name)
+        with self.assertRaises(CommandError):
+            call_command('import_data', 'posts', stream.name,
+                         batch_size=1, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), posts_count)
@@ -1,16 +1,27 @@
 from http import HTTPStatus
+from io import BytesIO
+import json
 import shutil
 import tempfile
+from unittest import mock
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.db import DatabaseError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from jobs import queue
+from jobs.models import Job
 
 from ..models import Group, Post, User, Comment
+from ..thumbnails import generate_thumbnail, schedule_image_processing
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
+ORIENTATION_TAG = 0x0112
+
 SMALL_GIF = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -126,6 +137,62 @@ class PostFormTests(TestCase):
         self.assertEqual(created_post.pub_date, post.pub_date)
         self.assertEqual(created_post.image.name, 'posts/other_small.gif')
 
+    def test_image_processed_by_job_queue(self):
+        """Картинка нового поста обрабатывается фоновой задачей"""
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[ORIENTATION_TAG] = 6
+        Image.new('RGB', (4, 2)).save(buffer, 'JPEG', exif=exif.tobytes())
+        self.authorized_user.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с фото',
+                  'image': SimpleUploadedFile('photo.jpeg',
+                                              buffer.getvalue(),
+                                              content_type='image/jpeg')}
+        )
+        post = Post.objects.get(text='Пост с фото')
+        job = Job.objects.get(name='posts.process_image')
+        self.assertEqual(json.loads(job.payload), {'post_id': post.id})
+        self.assertEqual(post.thumbnail.name, '')
+        queue.run_inline(queue.claim(1)[0])
+        self.assertEqual(queue.status(job.pk), Job.DONE)
+        post.refresh_from_db()
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertTrue(post.thumbnail.name)
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (2, 4))
+            self.assertNotIn(ORIENTATION_TAG, image.getexif())
+            self.assertTrue(image.info.get('progressive'))
+
+    def test_failed_processing_keeps_original(self):
+        """Упавшая обработка не удаляет исходную картинку поста"""
+        post = Post.objects.create(
+            text='Пост с фото', author=self.post_author,
+            image=SimpleUploadedFile('failing.gif', SMALL_GIF,
+                                     content_type='image/gif')
+        )
+        original = post.image.name
+        schedule_image_processing(post)
+        with mock.patch.object(Post, 'save', side_effect=DatabaseError):
+            job, = queue.claim(1)
+            queue.run_inline(job)
+        self.assertEqual(queue.status(job.pk), Job.QUEUED)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, original)
+        self.assertTrue(post.image.storage.exists(original))
+
+    def test_thumbnail_generated_outside_request(self):
+        """Миниатюра строится отдельно и выводится в шаблонах"""
+        url = reverse('posts:post_detail', args=[self.post.id])
+        response = self.guest_user.get(url)
+        self.assertEqual(self.post.thumbnail.name, '')
+        self.assertContains(response, self.post.image.url)
+        generate_thumbnail(self.post.id)
+        post = Post.objects.get(id=self.post.id)
+        self.assertTrue(post.thumbnail.name.startswith('cache/'))
+        self.assertTrue(post.thumbnail.storage.exists(post.thumbnail.name))
+        self.assertContains(self.guest_user.get(url), post.thumbnail.url)
+
     def test_nonauthorized_user_create_post(self):
         """Проверка создания поста неавторизованным пользователем."""
         posts_count = Post.objects.count()
@@ -1,7 +1,14 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post, Comment
+from ..models import Group, Post, Comment, Follow, UserCounters
 
 User = get_user_model()
 
@@ -123,3 +130,132 @@ class CommentModelTest(TestCase):
         """Проверка, что у модели Comment корректно работает __str__."""
         models = CommentModelTest.post
         self.assertEqual(models.text[:POST_TEXT_LIMIT], models.__str__())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+class FeedIndexesTest(TestCase):
+    def test_feeds_use_indexes_instead_of_sort(self):
+        """Ленты читаются по индексу без сортировки в базе."""
+        feeds = {
+            'index': Post.objects.for_feed(),
+            'group_posts': Post.objects.for_feed().filter(group_id=1),
+            'profile': Post.objects.for_feed().filter(author_id=1),
+            'comments': Comment.objects.filter(post_id=1),
+        }
+        for name, queryset in feeds.items():
+            with self.subTest(feed=name):
+                plan = queryset[:10].explain()
+                self.assertIn('USING INDEX', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='counted_author')
+        cls.reader = User.objects.create_user(username='counted_reader')
+        cls.group = Group.objects.create(
+            title='Группа со счётчиком',
+            slug='counted-group',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа со счётчиком',
+            slug='other-counted-group',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, user, **expected):
+        counters = UserCounters.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(counters, field), value)
+
+    def test_post_counters(self):
+        """Счётчики постов меняются при создании, переносе и удалении."""
+        post = Post.objects.create(author=self.author, group=self.group,
+                                   text='Пост')
+        self.assertCounters(self.author, posts_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.group = self.other_group
+        post.author = self.reader
+        post.save()
+        self.assertCounters(self.author, posts_count=0)
+        self.assertCounters(self.reader, posts_count=1)
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+        post.delete()
+        self.assertCounters(self.reader, posts_count=0)
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(self.author, followers_count=1)
+        self.assertCounters(self.reader, following_count=1)
+        follow.delete()
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+
+    def test_counters_do_not_go_negative(self):
+        """Удаление строк, созданных bulk_create, не уводит счётчики в минус"""
+        Post.objects.bulk_create([
+            Post(author=self.author, group=self.group, text='Пост')
+        ])
+        post = Post.objects.get(text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий')
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author)
+        ])
+        Comment.objects.all().delete()
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertCounters(self.author, posts_count=0, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_pages_without_counters_row(self):
+        """Профиль и пост открываются у пользователя без строки счётчиков"""
+        User.objects.bulk_create([User(username='bulk_author')])
+        author = User.objects.get(username='bulk_author')
+        post = Post.objects.create(author=author, text='Пост')
+        UserCounters.objects.filter(user=author).delete()
+        for url in (reverse('posts:profile', args=[author.username]),
+                    reverse('posts:post_detail', args=[post.pk])):
+            with self.subTest(url=url):
+                UserCounters.objects.filter(user=author).delete()
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertCounters(author, posts_count=1)
+
+    def test_recount_counters_fixes_drift(self):
+        """Команда recount_counters исправляет расхождения."""
+        Post.objects.bulk_create([
+            Post(author=self.author, group=self.group, text='Пост'),
+            Post(author=self.author, text='Пост'),
+        ])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, author=self.author)
+        ])
+        UserCounters.objects.filter(user=self.author).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertCounters(self.author, posts_count=2, followers_count=1)
+        self.assertCounters(self.reader, following_count=1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
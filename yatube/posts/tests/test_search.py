@@ -0,0 +1,127 @@
+from http import HTTPStatus
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, SearchTerm, User
+from ..paginator import POSTS_ON_PAGE
+from ..search import fts5_available, search_ids, terms
+from ..stemmer import stem
+
+
+class StemmerTest(SimpleTestCase):
+    def test_stem(self):
+        """Формы слова сводятся к одной основе"""
+        words = {
+            'книга': 'книг',
+            'книгами': 'книг',
+            'вагонов': 'вагон',
+            'важного': 'важн',
+            'красивейший': 'красив',
+            'неопределённость': 'неопределен',
+        }
+        for word, expected in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+    def test_terms(self):
+        """Текст разбивается на основы, латиница не стеммится"""
+        self.assertEqual(terms('Кошки любят Django!'),
+                         ['кошк', 'люб', 'django'])
+
+
+class SearchTestsMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher',
+                                            is_staff=True,
+                                            is_superuser=True)
+        cls.rare = Post.objects.create(
+            author=cls.user, text='Кошки гуляют по крыше'
+        )
+        cls.frequent = Post.objects.create(
+            author=cls.user, text='Кошка, кошку, кошкой: про кошек'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Собака спит на крыше'
+        )
+
+    def test_search_stems_and_ranks(self):
+        """Поиск находит формы слова, лучшие совпадения первыми"""
+        self.assertEqual(search_ids('кошка'),
+                         [self.frequent.pk, self.rare.pk])
+
+    def test_search_requires_all_terms(self):
+        """Пост должен содержать все слова запроса"""
+        self.assertEqual(search_ids('крыша кошки'), [self.rare.pk])
+        self.assertEqual(search_ids('крыша жираф'), [])
+        self.assertEqual(search_ids('!!!'), [])
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        self.other.text = 'Жираф спит'
+        self.other.save()
+        self.assertEqual(search_ids('жирафы'), [self.other.pk])
+        self.assertEqual(search_ids('собака'), [])
+        self.other.delete()
+        self.assertEqual(search_ids('жираф'), [])
+
+    def test_rebuild(self):
+        """Команда пересобирает индекс"""
+        Post.objects.bulk_create([Post(author=self.user, text='Новый жираф')])
+        self.assertEqual(search_ids('жираф'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(search_ids('жираф')), 1)
+        self.assertEqual(search_ids('кошка'),
+                         [self.frequent.pk, self.rare.pk])
+
+    def test_search_page(self):
+        """Страница поиска выводит найденные посты постранично"""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Ёжик номер {i}')
+            for i in range(POSTS_ON_PAGE + 1)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'ежики'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_PAGE)
+        self.assertContains(response, '?q=%D0%B5%D0%B6%D0%B8%D0%BA%D0%B8'
+                                      '&amp;page=2')
+        response = self.client.get(url, {'q': 'ежики', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 1)
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_admin_search(self):
+        """Поиск в админке использует поисковый индекс"""
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошками'}
+        )
+        self.assertEqual(
+            {post.pk for post in response.context['cl'].result_list},
+            {self.rare.pk, self.frequent.pk}
+        )
+
+
+@skipUnless(fts5_available(), 'SQLite собран без FTS5')
+@override_settings(POSTS_SEARCH_BACKEND='fts5')
+class Fts5SearchTest(SearchTestsMixin, TestCase):
+    def test_model_index_unused(self):
+        """С FTS5 индекс на моделях не заполняется"""
+        self.assertFalse(SearchTerm.objects.exists())
+
+
+@override_settings(POSTS_SEARCH_BACKEND='index')
+class ModelIndexSearchTest(SearchTestsMixin, TestCase):
+    def test_model_index(self):
+        """Слова поста хранятся с числом вхождений"""
+        self.assertEqual(
+            SearchTerm.objects.get(post=self.frequent, term='кошк').frequency,
+            3
+        )
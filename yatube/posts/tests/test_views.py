@@ -1,14 +1,26 @@
 # Исправлены только докстринги, остальное соотвествует
 # принятому проекту 5 спринта
 
+from io import StringIO
+from unittest import mock, skipUnless
+
 from django import forms
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from http import HTTPStatus
 
-from ..models import Group, Post, User, Comment, Follow
+from jobs import queue
+
+from ..following import FOLLOW_BATCH_SIZE, followed_authors
+from ..models import Group, Post, User, Comment, Follow, TimelineEntry
+from ..paginator import (COMMENTS_ON_PAGE, ELLIPSIS, CursorPaginator,
+                         elided_page_range, paginate)
+from ..timeline import follow_feed
 
 
 class PostPagesTests(TestCase):
@@ -159,6 +171,21 @@ class PostPagesTests(TestCase):
                 self.assertIsInstance(form_field, expected)
         self.assertFalse(response.context['is_edit'])
 
+    def test_forms_render_outside_transaction(self):
+        """Формы открываются без транзакции, транзакция — только запись"""
+        urls = (reverse('posts:post_create'),
+                reverse('posts:post_edit', args=[self.post.id]))
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertFalse([query for query in queries
+                                  if 'SAVEPOINT' in query['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.post(urls[0], {'text': 'Новый пост'})
+        self.assertTrue([query for query in queries
+                         if 'SAVEPOINT' in query['sql']])
+
     def test_post_with_group_on_index_page(self):
         """Если при создании поста указать группу,
         пост появляется на главной странице"""
@@ -205,16 +232,79 @@ class PostPagesTests(TestCase):
     def test_cache_work(self):
         """"Проверка корректности кеширования"""
         response = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Текст мимо сигналов')
+        response_after_update = self.authorized_client.get(reverse
+                                                           ('posts:index'))
+        self.assertEqual(response.content, response_after_update.content)
         Post.objects.all().delete()
         response_after_delete_post = self.authorized_client.get(reverse
                                                                 ('posts:index')
                                                                 )
-        self.assertEqual(response.content, response_after_delete_post.content)
-        cache.clear()
-        response_after_cache_clear = (self.authorized_client.get
-                                      (reverse('posts:index')))
         self.assertNotEqual(response.content,
-                            response_after_cache_clear.content)
+                            response_after_delete_post.content)
+
+    def test_cache_invalidated_by_signals(self):
+        """Сигналы сбрасывают кеш только затронутых лент"""
+        other_group = Group.objects.create(title='Другая группа',
+                                           slug='other-slug',
+                                           description='Описание')
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_posts',
+                             kwargs={'slug': self.group.slug}),
+            'other_group': reverse('posts:group_posts',
+                                   kwargs={'slug': other_group.slug}),
+        }
+        cache.clear()
+        before = {name: self.authorized_client.get(url).content
+                  for name, url in urls.items()}
+        Post.objects.create(text='Новый пост группы', author=self.user,
+                            group=self.group)
+        after = {name: self.authorized_client.get(url).content
+                 for name, url in urls.items()}
+        self.assertNotEqual(before['index'], after['index'])
+        self.assertNotEqual(before['group'], after['group'])
+        self.assertEqual(before['other_group'], after['other_group'])
+
+    def test_group_and_profile_cache_versioned(self):
+        """Страницы группы и профиля кешируются до изменения контента"""
+        cache.clear()
+        urls = (
+            reverse('posts:group_posts', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Пост мимо кеша')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.authorized_client.get(url),
+                                       'Пост мимо кеша')
+        self.authorized_client.post(reverse('posts:post_create'),
+                                    {'text': 'Новый пост',
+                                     'group': self.group.pk})
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Пост мимо кеша')
+                self.assertContains(response, 'Новый пост')
+
+    def test_post_detail_cache_versioned(self):
+        """Страница поста кешируется до нового комментария"""
+        cache.clear()
+        url = reverse('posts:post_detail', args=[self.post.id])
+        self.client.get(url)
+        Comment.objects.filter(pk=self.comment.pk).update(
+            text='Комментарий мимо кеша'
+        )
+        self.assertNotContains(self.client.get(url), 'Комментарий мимо кеша')
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.id]),
+            {'text': 'Новый комментарий'}
+        )
+        response = self.client.get(url)
+        self.assertContains(response, 'Комментарий мимо кеша')
+        self.assertContains(response, 'Новый комментарий')
 
 
 FIRST_POST = 1
@@ -239,6 +329,7 @@ class PaginatorTests(TestCase):
                  group=cls.group_pag,
                  )
             for i in range(FIRST_POST, FINAL_POST)])
+        call_command('recount_counters', stdout=StringIO())
 
     def setUp(self):
         self.authorized_client = Client()
@@ -283,6 +374,67 @@ class PaginatorTests(TestCase):
         self.assertEqual(len(response_second.context['page_obj']),
                          POSTS_ON_FINAL_PAGE)
 
+    def test_elided_page_range(self):
+        """Пагинатор выводит окно страниц вокруг текущей"""
+        self.assertEqual(
+            list(elided_page_range(50, 100)),
+            [1, ELLIPSIS, 48, 49, 50, 51, 52, ELLIPSIS, 100]
+        )
+        self.assertEqual(list(elided_page_range(1, 100)),
+                         [1, 2, 3, ELLIPSIS, 100])
+        self.assertEqual(list(elided_page_range(99, 100)),
+                         [1, ELLIPSIS, 97, 98, 99, 100])
+        self.assertEqual(list(elided_page_range(2, 3)), [1, 2, 3])
+
+    def test_paginator_renders_elided_range(self):
+        """Ссылки на страницы в шаблоне ограничены окном"""
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user_pag}),
+            {'page': 1}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.elided_page_range, [1, 2])
+        self.assertContains(response, '?page=2')
+
+    def test_cursor_paginator_index_page(self):
+        """Курсорная пагинация на главной странице"""
+        url = reverse('posts:index')
+        response_first = self.authorized_client.get(url + '?cursor=')
+        page_first = response_first.context['page_obj']
+        self.assertEqual(len(page_first), POSTS_ON_FIRST_PAGE)
+        self.assertFalse(page_first.has_previous())
+        self.assertTrue(page_first.has_next())
+        self.assertContains(response_first,
+                            f'?cursor={page_first.next_cursor}')
+        response_second = self.authorized_client.get(
+            url + f'?cursor={page_first.next_cursor}')
+        page_second = response_second.context['page_obj']
+        self.assertEqual(len(page_second), POSTS_ON_FINAL_PAGE)
+        self.assertFalse(page_second.has_next())
+        self.assertTrue(page_second.has_previous())
+        self.assertFalse(set(page_first) & set(page_second))
+        response_back = self.authorized_client.get(
+            url + f'?cursor={page_second.previous_cursor}')
+        self.assertEqual(list(response_back.context['page_obj']),
+                         list(page_first))
+
+    def test_cursor_paginator_without_count(self):
+        """Курсорная пагинация не считает общее число постов"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index') + '?cursor=')
+        self.assertFalse(any('COUNT(' in query['sql']
+                             for query in queries.captured_queries))
+
+    def test_cursor_paginator_broken_cursor(self):
+        """Битый курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:group_posts',
+                    kwargs={'slug': self.group_pag.slug})
+            + '?cursor=broken')
+        self.assertEqual(len(response.context['page_obj']),
+                         POSTS_ON_FIRST_PAGE)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
 
 class FollowTest(TestCase):
     @classmethod
@@ -349,3 +501,527 @@ class FollowTest(TestCase):
             reverse('posts:follow_index'),
         )
         self.assertNotIn(self.post, response.context['page_obj'].object_list)
+
+    def test_feed_versioned_by_followed_authors(self):
+        """Лента подписок сбрасывается постами и переименованием
+        автора, а посты других авторов её не трогают"""
+        cache.clear()
+        Follow.objects.create(user=self.follower, author=self.author)
+        feed = reverse('posts:follow_index')
+        before = self.follower_is_user.get(feed).content
+        Post.objects.create(author=self.unfollower, text='Чужой пост')
+        self.assertEqual(self.follower_is_user.get(feed).content, before)
+        Post.objects.create(author=self.author, text='Пост автора')
+        self.assertContains(self.follower_is_user.get(feed), 'Пост автора')
+        self.follower_is_user.get(reverse('posts:index'))
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        for url in (feed, reverse('posts:index')):
+            with self.subTest(url=url):
+                self.assertContains(self.follower_is_user.get(url),
+                                    'Переименованный')
+
+    def test_followed_authors_loaded_once(self):
+        """Подписки пользователя читаются одним запросом и кешируются"""
+        cache.clear()
+        others = [User.objects.create_user(username=f'author{number}')
+                  for number in range(3)]
+        for author in others:
+            Follow.objects.create(user=self.follower, author=author)
+        user = User.objects.get(pk=self.follower.pk)
+        with self.assertNumQueries(1):
+            authors = followed_authors(user)
+            self.assertIs(followed_authors(user), authors)
+        self.assertEqual(authors, {author.pk for author in others})
+        user = User.objects.get(pk=self.follower.pk)
+        with self.assertNumQueries(0):
+            followed_authors(user)
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertIn(self.author.pk, followed_authors(
+            User.objects.get(pk=self.follower.pk)
+        ))
+
+    def test_follow_buttons_on_feed(self):
+        """Кнопки подписки на карточках ленты отражают подписки читателя"""
+        cache.clear()
+        follow_url = reverse('posts:profile_follow', args=[self.author])
+        unfollow_url = reverse('posts:profile_unfollow', args=[self.author])
+        index = reverse('posts:index')
+        response = self.follower_is_user.get(index)
+        self.assertContains(response, follow_url)
+        self.follower_is_user.get(follow_url)
+        response = self.follower_is_user.get(index)
+        self.assertContains(response, unfollow_url)
+        self.assertNotContains(response, follow_url)
+        response = self.unfollower_is_user.get(index)
+        self.assertContains(response, follow_url)
+        for client in (self.author_is_user, self.client):
+            response = client.get(index)
+            self.assertNotContains(response, follow_url)
+            self.assertNotContains(response, unfollow_url)
+
+    def test_feed_fragment_shared_between_viewers(self):
+        """Список карточек кешируется один на всех, кнопки — свои"""
+        cache.clear()
+        Follow.objects.create(user=self.follower, author=self.author)
+        index = reverse('posts:index')
+        self.follower_is_user.get(index)
+        Post.objects.filter(pk=self.post.pk).update(text='Текст мимо кеша')
+        response = self.unfollower_is_user.get(index)
+        self.assertNotContains(response, 'Текст мимо кеша')
+        self.assertContains(
+            response, reverse('posts:profile_follow', args=[self.author])
+        )
+        response = self.follower_is_user.get(index)
+        self.assertContains(
+            response, reverse('posts:profile_unfollow', args=[self.author])
+        )
+        self.assertNotContains(response, 'follow-button')
+
+    def test_profile_following_in_author_query(self):
+        """Статус подписки на профиле не требует отдельного запроса"""
+        Follow.objects.create(user=self.follower, author=self.author)
+        url = reverse('posts:profile', args=[self.author.username])
+        for client, following in ((self.follower_is_user, True),
+                                  (self.unfollower_is_user, False),
+                                  (self.client, False)):
+            with self.subTest(following=following):
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertIs(response.context['following'], following)
+                self.assertFalse([
+                    query for query in queries
+                    if query['sql'].startswith('SELECT (1) AS "a" FROM '
+                                               '"posts_follow"')
+                ])
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.bulk_create([
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_ON_PAGE + POSTS_ON_FINAL_PAGE)
+        ])
+
+    def test_post_detail_renders_first_comments_page(self):
+        """На странице поста выводится только первая страница комментариев"""
+        cache.clear()
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertContains(
+            response,
+            reverse('posts:comments', args=[self.post.id])
+            + f'?cursor={comments.next_cursor}'
+        )
+
+    def test_comments_endpoint_loads_next_page(self):
+        """Фрагмент с комментариями подгружает следующую страницу"""
+        url = reverse('posts:comments', args=[self.post.id])
+        first = self.client.get(url).context['comments']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url,
+                                       {'cursor': first.next_cursor})
+        self.assertEqual(len(queries), 2)
+        second = response.context['comments']
+        self.assertEqual(len(second), POSTS_ON_FINAL_PAGE)
+        self.assertFalse(second.has_next())
+        self.assertNotContains(response, 'load-comments')
+        self.assertFalse(set(first) & set(second))
+
+    def test_comments_endpoint_unknown_post(self):
+        """Фрагмент комментариев несуществующего поста отдаёт 404"""
+        response = self.client.get(reverse('posts:comments', args=[0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.reader = User.objects.create_user(username='timeline_reader')
+        cls.old_post = Post.objects.create(author=cls.author,
+                                           text='Старый пост')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def follow_feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return response.context['page_obj'].object_list
+
+    def test_follow_backfills_and_unfollow_prunes_timeline(self):
+        """Подписка наполняет ленту, отписка очищает её"""
+        self.client.get(reverse('posts:profile_follow',
+                                kwargs={'username': self.author.username}))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.old_post).exists())
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(list(self.follow_feed()),
+                         [new_post, self.old_post])
+        self.client.get(reverse('posts:profile_unfollow',
+                                kwargs={'username': self.author.username}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(list(self.follow_feed()), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_heavy_author_posts_are_read_on_demand(self):
+        """Посты популярного автора подмешиваются в ленту при чтении"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(list(self.follow_feed()),
+                         [new_post, self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_feed_merges_timeline_and_heavy_authors(self):
+        """Записи ленты и посты популярного автора сливаются по дате"""
+        heavy = User.objects.create_user(username='heavy_author')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=heavy)
+        Follow.objects.create(user=self.author, author=heavy)
+        for number in range(3):
+            Post.objects.create(author=heavy, text=f'Популярный {number}')
+            Post.objects.create(author=self.author, text=f'Обычный {number}')
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        feed = follow_feed(self.reader)
+        self.assertEqual(feed.count(), len(expected))
+        numbered = []
+        for number in (1, 2, 3, 4):
+            numbered += list(paginate(feed, number, 2).object_list)
+        self.assertEqual(numbered, expected)
+        paginator = CursorPaginator(feed, 3)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first) + list(second), expected[:6])
+        self.assertEqual(list(paginator.get_page(second.previous_cursor)),
+                         expected[:3])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_feed_version_does_not_grow_with_follows(self):
+        """Версия ленты — записи читателя и только популярные авторы"""
+        heavy = User.objects.create_user(username='heavy_author')
+        Follow.objects.create(user=self.author, author=heavy)
+        for author in [self.author, heavy, *(
+                User.objects.create_user(username=f'light{number}')
+                for number in range(3))]:
+            Follow.objects.create(user=self.reader, author=author)
+        self.assertEqual(follow_feed(self.reader).scopes(),
+                         [f'timeline:{self.reader.pk}', f'author:{heavy.pk}'])
+
+    def test_feed_cache_follows_post_changes(self):
+        """Кеш ленты сбрасывается при правке и удалении постов из неё"""
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.author)
+        feed = reverse('posts:follow_index')
+        self.assertContains(self.client.get(feed), 'Старый пост')
+        post = Post.objects.get(pk=self.old_post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertContains(self.client.get(feed), 'Исправленный пост')
+        post.delete()
+        self.assertNotContains(self.client.get(feed), 'Исправленный пост')
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_below_limit_is_fanned_out_again(self):
+        """Посты, вышедшие у популярного автора, раскладываются, когда
+        он перестаёт быть популярным"""
+        other = User.objects.create_user(username='other_reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        heavy_post = Post.objects.create(author=self.author,
+                                         text='Пока популярен')
+        self.assertFalse(TimelineEntry.objects.filter(
+            post=heavy_post).exists())
+        follow.delete()
+        job, = queue.claim(1)
+        self.assertEqual(job.name, 'posts.refill_timelines')
+        queue.run_inline(job)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=heavy_post).exists())
+        self.assertEqual(list(self.follow_feed()),
+                         [heavy_post, self.old_post])
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_feed_reads_timeline_index(self):
+        """Лента читается по индексу записей, а не сортировкой постов"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        feed = follow_feed(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            list(feed[0:10])
+        self.assertIn('FROM "posts_timelineentry"', queries[1]['sql'])
+        timeline, id_field = feed.sources()[0]
+        plan = timeline.order_by('-pub_date', f'-{id_field}')[:10].explain()
+        self.assertIn('timeline_user_pub_date_idx', plan)
+        self.assertNotIn('FOR ORDER BY', plan)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа ленты',
+            slug='feed-slug',
+            description='Тестовое описание группы ленты',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'feed_author_{i}',
+                                     first_name='Имя', last_name='Фамилия')
+            for i in range(POSTS_ON_FIRST_PAGE)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_posts', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': cls.authors[0].username}),
+            reverse('posts:follow_index'),
+        )
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        Post.objects.create(text='Пост', author=self.authors[0],
+                            group=self.group)
+        queries_single = {url: self.count_queries(url) for url in self.urls}
+        Post.objects.bulk_create([
+            Post(text='Пост', author=author, group=self.group)
+            for author in self.authors
+        ])
+        Post.objects.bulk_create([
+            Post(text='Пост', author=self.authors[0], group=self.group)
+            for _ in range(POSTS_ON_FIRST_PAGE)
+        ])
+        call_command('recount_counters', stdout=StringIO())
+        call_command('rebuild_timelines', stdout=StringIO())
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url),
+                                 queries_single[url])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='validator')
+        cls.group = Group.objects.create(title='Группа', slug='etag',
+                                         description='Описание')
+        cls.post = Post.objects.create(author=cls.user, text='Пост',
+                                       group=cls.group)
+        cls.urls = (
+            (reverse('posts:index'), 0),
+            (reverse('posts:group_posts', args=[cls.group.slug]), 1),
+            (reverse('posts:profile', args=[cls.user.username]), 1),
+            (reverse('posts:post_detail', args=[cls.post.id]), 1),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified_costs_at_most_one_query(self):
+        """Ответ 304 отдаётся без рендера и стоит не больше запроса"""
+        for url, queries in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        """Last-Modified принимается в If-Modified-Since"""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_validators_change_with_content(self):
+        """Новый комментарий и подписка меняют ETag"""
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        etag = self.client.get(detail)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        profile = reverse('posts:profile', args=[self.user.username])
+        etag = self.client.get(profile)['ETag']
+        Follow.objects.create(
+            user=User.objects.create_user(username='follower'),
+            author=self.user
+        )
+        response = self.client.get(profile, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_validators_depend_on_client(self):
+        """Страница вошедшего пользователя имеет свой ETag"""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_no_last_modified_for_clients(self):
+        """Страницы вошедшего пользователя не отдают Last-Modified"""
+        url = reverse('posts:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        authorized_client = Client()
+        authorized_client.force_login(self.user)
+        response = authorized_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_missing_objects_are_not_found(self):
+        """Для несуществующих объектов валидаторов нет, ответ 404"""
+        for url in (reverse('posts:group_posts', args=['missing']),
+                    reverse('posts:profile', args=['missing']),
+                    reverse('posts:post_detail', args=[0])):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_FOUND)
+                self.assertFalse(response.has_header('ETag'))
+
+
+class FollowManyTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'writer{number}')
+                       for number in range(6)]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def follow(self, usernames, url='posts:profile_follow_many'):
+        return self.client.post(reverse(url), {'username': usernames})
+
+    def counters(self, user):
+        user.counters.refresh_from_db()
+        return user.counters.followers_count, user.counters.following_count
+
+    def test_follow_many(self):
+        """Подписка пачкой обновляет счётчики, ленту и кеш подписок"""
+        self.assertEqual(len(followed_authors(self.reader)), 1)
+        usernames = [author.username for author in self.authors[:4]]
+        response = self.follow(usernames + ['reader', 'missing'])
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(self.counters(self.reader), (0, 4))
+        self.assertEqual(self.counters(self.authors[3]), (1, 0))
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post__author', flat=True)),
+            {author.pk for author in self.authors[:4]}
+        )
+        reader = User.objects.get(pk=self.reader.pk)
+        self.assertEqual(followed_authors(reader),
+                         {author.pk for author in self.authors[:4]})
+
+    @override_settings(TIMELINE_BATCH_SIZE=1)
+    def test_follow_many_backfills_all_posts(self):
+        """В ленту попадают все посты автора, а не только последние"""
+        author = self.authors[1]
+        for number in range(3):
+            Post.objects.create(author=author, text=f'Пост {number}')
+        self.follow([author.username])
+        self.assertCountEqual(
+            TimelineEntry.objects.filter(
+                user=self.reader, post__author=author
+            ).values_list('post', flat=True),
+            Post.objects.filter(author=author).values_list('pk', flat=True)
+        )
+
+    def test_follow_many_queries_do_not_grow(self):
+        """Число запросов не зависит от числа авторов"""
+        with CaptureQueriesContext(connection) as few:
+            self.follow([author.username for author in self.authors[1:3]])
+        Follow.objects.filter(user=self.reader).exclude(
+            author=self.authors[0]
+        ).delete()
+        with CaptureQueriesContext(connection) as many:
+            self.follow([author.username for author in self.authors[1:]])
+        self.assertEqual(len(few), len(many))
+
+    def test_unfollow_many(self):
+        """Отписка пачкой удаляет подписки, записи ленты и счётчики"""
+        self.follow([author.username for author in self.authors[:3]])
+        response = self.follow(
+            [author.username for author in self.authors[:2]],
+            url='posts:profile_unfollow_many'
+        )
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.reader).values_list(
+                'author', flat=True
+            )), [self.authors[2].pk]
+        )
+        self.assertEqual(self.counters(self.reader), (0, 1))
+        self.assertEqual(self.counters(self.authors[0]), (0, 0))
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(
+                user=self.reader
+            ).values_list('post__author', flat=True)),
+            {self.authors[2].pk}
+        )
+
+    def test_unfollow_many_mutes_follow_signals(self):
+        """Отписка пачкой не вызывает обработчики на каждую подписку"""
+        self.follow([author.username for author in self.authors[:3]])
+        with mock.patch('posts.signals.change_follow_counters') as change:
+            self.follow([author.username for author in self.authors[:3]],
+                        url='posts:profile_unfollow_many')
+        change.assert_not_called()
+        self.assertFalse(Follow.objects.filter(user=self.reader).exists())
+        Follow.objects.create(user=self.reader, author=self.authors[0])
+        Follow.objects.get(user=self.reader).delete()
+        self.assertEqual(self.counters(self.reader), (0, 0))
+
+    def test_follow_many_limits(self):
+        """Только POST, только для авторизованных, с ограничением пачки"""
+        url = reverse('posts:profile_follow_many')
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
+        response = self.follow(['writer1'] * (FOLLOW_BATCH_SIZE + 1))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.client.logout()
+        response = self.follow(['writer1'])
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(Follow.objects.count(), 1)
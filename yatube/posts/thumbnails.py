@@ -0,0 +1,88 @@
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import enqueue
+from posts.models import Post
+
+# Геометрия миниатюр из includes/post_card.html и posts/post_detail.html.
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+IMAGE_FORMATS = {
+    'JPEG': ('.jpg', {'quality': 85, 'optimize': True,
+                      'progressive': True}),
+    'WEBP': ('.webp', {'quality': 80, 'method': 6}),
+}
+
+
+def reencode_image(image_file, image_format):
+    """Поворачивает по EXIF, удаляет метаданные и перекодирует картинку.
+
+    Анимированные картинки не трогает и возвращает None.
+    """
+    extension, options = IMAGE_FORMATS[image_format]
+    with image_file.open('rb'), Image.open(image_file) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'L') and image_format == 'JPEG':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+    name = os.path.splitext(os.path.basename(image_file.name))[0]
+    return ContentFile(buffer.getvalue(), name=name + extension)
+
+
+def generate_thumbnail(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    # Миниатюра строится вне транзакции, чтобы не держать блокировку
+    # записи SQLite, пока работает Pillow.
+    thumbnail = get_thumbnail(post.image, THUMBNAIL_GEOMETRY,
+                              **THUMBNAIL_OPTIONS)
+    with transaction.atomic():
+        if not Post.objects.filter(pk=post_id,
+                                   image=post.image.name).exists():
+            return
+        post.thumbnail.name = thumbnail.name
+        post.save(update_fields=['thumbnail'])
+
+
+def process_image(post_id):
+    """Перекодирует картинку поста и строит для неё миниатюру.
+
+    Картинка перекодируется вне транзакции; в короткой транзакции пост
+    получает новую картинку, если её не успели заменить. Оригинал
+    удаляется только после коммита, поэтому пост никогда не ссылается
+    на удалённый файл.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    reencoded = reencode_image(post.image, settings.POSTS_IMAGE_FORMAT)
+    if reencoded is not None:
+        original = post.image.name
+        storage = post.image.storage
+        post.image.save(reencoded.name, reencoded, save=False)
+        with transaction.atomic():
+            if not Post.objects.filter(pk=post_id,
+                                       image=original).exists():
+                # Картинку уже заменили: перекодированная не нужна.
+                name = post.image.name
+                transaction.on_commit(lambda: storage.delete(name))
+                return
+            post.save(update_fields=['image'])
+            transaction.on_commit(lambda: storage.delete(original))
+    generate_thumbnail(post_id)
+
+
+def schedule_image_processing(post):
+    """Ставит обработку картинки поста в очередь фоновых задач."""
+    enqueue('posts.process_image', post_id=post.pk)
@@ -0,0 +1,246 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from jobs.queue import enqueue
+from posts.caching import bump
+from posts.models import Follow, Post, TimelineEntry, UserCounters
+
+
+def touch(user_ids):
+    """Меняет версию лент user_ids: в них добавились или ушли записи."""
+    bump(*(f'timeline:{user_id}' for user_id in user_ids))
+
+
+def is_heavy(author_id):
+    return UserCounters.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+class FollowFeed:
+    """Лента подписок в порядке индексов, без сортировки всех постов.
+
+    Записи TimelineEntry читаются по индексу (user, -pub_date), посты
+    популярных авторов — по (author, -pub_date); потоки сливаются по
+    (pub_date, id). Для Paginator есть count() и срезы, для
+    CursorPaginator — keyset().
+    """
+
+    def __init__(self, user, posts=None):
+        self.user = user
+        self.posts = Post.objects.all() if posts is None else posts
+
+    def for_feed(self):
+        return FollowFeed(self.user, self.posts.for_feed())
+
+    def values(self, *fields):
+        return FollowFeed(self.user, self.posts.values(*fields))
+
+    @cached_property
+    def heavy_authors(self):
+        return list(Follow.objects.filter(
+            user=self.user,
+            author__counters__followers_count__gt=(
+                settings.TIMELINE_FANOUT_LIMIT
+            )
+        ).values_list('author_id', flat=True))
+
+    def scopes(self):
+        """Области кеша ленты: свои записи и популярные авторы.
+
+        Лента не зависит от числа подписок: записи меняют timeline:<id>
+        при раскладке, а автор нужен только для подмешиваемых постов.
+        """
+        return [f'timeline:{self.user.pk}',
+                *(f'author:{author_id}' for author_id in self.heavy_authors)]
+
+    def sources(self):
+        """Потоки (pub_date, id поста) и имя поля id в каждом."""
+        timeline = TimelineEntry.objects.filter(user=self.user)
+        if self.heavy_authors:
+            # Записи, разложенные до того, как автор стал популярным.
+            timeline = timeline.exclude(
+                post__author_id__in=self.heavy_authors
+            )
+        sources = [(timeline.values_list('pub_date', 'post_id'), 'post_id')]
+        for author_id in self.heavy_authors:
+            sources.append((Post.objects.filter(
+                author_id=author_id
+            ).values_list('pub_date', 'id'), 'id'))
+        return sources
+
+    def count(self):
+        return sum(queryset.count() for queryset, _ in self.sources())
+
+    def keys(self, limit, position=None, backwards=False):
+        """Первые limit пар (pub_date, id) после position.
+
+        По убыванию, а при backwards — по возрастанию от position.
+        """
+        lookup = 'gt' if backwards else 'lt'
+        streams = []
+        for queryset, id_field in self.sources():
+            if position is not None:
+                value, pk = position
+                queryset = queryset.filter(
+                    Q(**{f'pub_date__{lookup}': value})
+                    | Q(pub_date=value, **{f'{id_field}__{lookup}': pk})
+                )
+            if backwards:
+                queryset = queryset.order_by('pub_date', id_field)
+            else:
+                queryset = queryset.order_by('-pub_date', f'-{id_field}')
+            streams.append(queryset[:limit])
+        return list(islice(heapq.merge(*streams, reverse=not backwards),
+                           limit))
+
+    def rows(self, keys):
+        ids = [pk for _, pk in keys]
+        found = {}
+        for row in self.posts.filter(pk__in=ids):
+            found[row['id'] if isinstance(row, dict) else row.pk] = row
+        return [found[pk] for pk in ids if pk in found]
+
+    def keyset(self, limit, position=None, backwards=False):
+        # Генератор: страница читается при первом обращении к CursorPage.
+        yield from self.rows(self.keys(limit, position, backwards))
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        return self.rows(self.keys(index.stop)[start:])
+
+
+def follow_feed(user):
+    """Лента подписок: разложенные записи и посты популярных авторов."""
+    return FollowFeed(user)
+
+
+def fan_out(post):
+    if is_heavy(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    add_entries(followers, [(post.pk, post.pub_date)])
+
+
+def fan_out_many(posts):
+    """fan_out() для постов, созданных bulk_create, без запроса на пост."""
+    author_posts = defaultdict(list)
+    for post in posts:
+        author_posts[post.author_id].append((post.pk, post.pub_date))
+    heavy_authors = UserCounters.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('user_id')
+    followers = defaultdict(list)
+    for author_id, user_id in Follow.objects.filter(
+        author_id__in=author_posts
+    ).exclude(author__in=heavy_authors).values_list('author_id', 'user_id'):
+        followers[author_id].append(user_id)
+    for author_id, user_ids in followers.items():
+        add_entries(user_ids, author_posts[author_id])
+
+
+def add_entries(user_ids, posts, model=TimelineEntry):
+    """Кладёт посты (пары id, pub_date) в ленты user_ids пачками."""
+    user_ids = list(user_ids)
+    entries = (model(user_id=user_id, post_id=pk, pub_date=pub_date)
+               for user_id in user_ids for pk, pub_date in posts)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            break
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+    if user_ids:
+        touch(user_ids)
+
+
+def backfill(user_id, author_id):
+    backfill_many(user_id, [author_id])
+
+
+def backfill_many(user_id, author_ids):
+    """Кладёт в ленту user_id все посты непопулярных авторов author_ids."""
+    light_authors = UserCounters.objects.filter(
+        user_id__in=author_ids,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT
+    ).values('user_id')
+    posts = Post.objects.filter(author__in=light_authors).values_list(
+        'pk', 'pub_date'
+    )
+    add_entries([user_id], posts.iterator())
+
+
+def refill(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    Нужна, когда автор перестаёт быть популярным: пока он им был, его
+    посты не раскладывались и подмешивались в ленты при чтении.
+    """
+    if is_heavy(author_id):
+        return
+    posts = list(Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date'
+    ))
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    add_entries(followers.iterator(), posts)
+
+
+def schedule_refill(author_ids):
+    """Ставит refill() для авторов, только что ставших непопулярными.
+
+    Подписчики уходят по одному, поэтому автор перестаёт быть популярным
+    ровно при followers_count == TIMELINE_FANOUT_LIMIT.
+    """
+    crossed = UserCounters.objects.filter(
+        user_id__in=author_ids,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('user_id', flat=True)
+    for author_id in crossed:
+        enqueue('posts.refill_timelines', author_id=author_id)
+
+
+def prune(user_id, *author_ids):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id__in=author_ids).delete()
+    touch([user_id])
+
+
+def readers(post_id):
+    """Пользователи, в чьи ленты разложен пост."""
+    return list(TimelineEntry.objects.filter(
+        post_id=post_id
+    ).values_list('user_id', flat=True))
+
+
+def rebuild(apps=global_apps):
+    """Заново раскладывает посты по лентам всех подписчиков."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    heavy_authors = UserCounters.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values('user_id')
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        follows = Follow.objects.exclude(
+            author__in=heavy_authors
+        ).values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            posts = Post.objects.filter(author_id=author_id).values_list(
+                'pk', 'pub_date'
+            )
+            add_entries([user_id], posts.iterator(), model=TimelineEntry)
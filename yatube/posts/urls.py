@@ -13,7 +13,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comments_page,
+         name='comments'),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/add/', views.profile_follow_many,
+         name='profile_follow_many'),
+    path('follow/remove/', views.profile_unfollow_many,
+         name='profile_unfollow_many'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -1,68 +1,181 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import HttpResponseBadRequest
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
 
-from .models import Post, Group, User, Follow
-from .paginator import paginate
+from .caching import generation
+from .conditional import conditional
+from .counters import user_counters
+from .following import (FOLLOW_BATCH_SIZE, follow_many, followed_authors,
+                        unfollow_many)
+from .models import Comment, Post, Group, User, Follow
+from .paginator import COMMENTS_ON_PAGE, CursorPaginator, paginate
+from .search import search_ids
+from .thumbnails import schedule_image_processing
+from .timeline import follow_feed
 from posts.forms import CommentForm, PostForm
 
 
+def viewer_scopes(request):
+    """Кнопки подписки на карточках зависят от подписок пользователя.
+
+    Нужны только для ETag: список карточек кешируется один на всех, а
+    кнопки подставляются тегом follow_buttons.
+    """
+    if request.user.is_authenticated:
+        return [f'following:{request.user.pk}']
+    return []
+
+
+def index_scopes(request):
+    return ['index', 'groups', *viewer_scopes(request)]
+
+
+def group_scopes(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [f'group:{group_id}', *viewer_scopes(request)]
+
+
+def profile_scopes(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [f'author:{author_id}', f'followers:{author_id}', 'groups']
+
+
+def post_scopes(request, post_id):
+    owners = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if owners is None:
+        return None
+    author_id, group_id = owners
+    scopes = [f'post:{post_id}', f'author:{author_id}']
+    if group_id is not None:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+@conditional(index_scopes)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.for_feed()
     page_number = request.GET.get('page')
-    page_obj = paginate(post_list, page_number)
+    page_obj = paginate(post_list, page_number,
+                        cursor=request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
+        'cache_version': generation('index', 'groups'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.for_feed()
     page_number = request.GET.get('page')
-    page_obj = paginate(post_list, page_number)
+    page_obj = paginate(post_list, page_number,
+                        cursor=request.GET.get('cursor'),
+                        count=group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_version': generation(f'group:{group.pk}'),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional(profile_scopes)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(User.objects.select_related('counters'),
+                               username=username)
+    posts = author.posts.for_feed()
     page_number = request.GET.get('page')
-    page_obj = paginate(posts, page_number)
-    following = (request.user.is_authenticated
-                 and Follow.objects.filter(author=author,
-                                           user=request.user).exists())
+    page_obj = paginate(posts, page_number,
+                        cursor=request.GET.get('cursor'),
+                        count=user_counters(author).posts_count)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following,
+        'following': author.pk in followed_authors(request.user),
+        'cache_version': generation(f'author:{author.pk}', 'groups'),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional(post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'),
+        pk=post_id
+    )
+    user_counters(post.author)
+    comments = paginate_comments(post.pk, None)
     form = CommentForm()
+    scopes = [f'post:{post.pk}', f'author:{post.author_id}']
+    if post.group_id is not None:
+        scopes.append(f'group:{post.group_id}')
     context = {
         'post': post,
         'form': form,
         'comments': comments,
+        'is_author': request.user == post.author,
+        'cache_version': generation(*scopes),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def paginate_comments(post_id, cursor):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post', 'author', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_ON_PAGE,
+                                order_field='created')
+    return paginator.get_page(cursor)
+
+
+def comments_page(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': paginate_comments(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = paginate(search_ids(query), request.GET.get('page'))
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [posts[pk] for pk in page_obj.object_list
+                            if pk in posts]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Пост, счётчики и задача обработки картинки — одной транзакцией.
+        with transaction.atomic():
+            post.save()
+            if post.image:
+                schedule_image_processing(post)
         return redirect('posts:profile', request.user.username)
 
     context = {
@@ -82,7 +195,13 @@ def post_edit(request, post_id):
                     instance=post)
     is_edit = True
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        if 'image' in form.changed_data:
+            post.thumbnail = ''
+        with transaction.atomic():
+            post.save()
+            if 'image' in form.changed_data and post.image:
+                schedule_image_processing(post)
         return redirect('posts:post_detail', post_id)
     return render(request, template, {'form': form, 'is_edit': is_edit})
 
@@ -95,17 +214,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    # Версия до чтения ленты: свежий bump переключает чтение на primary.
+    posts = follow_feed(request.user).for_feed()
+    cache_version = generation('groups', *posts.scopes())
     page_number = request.GET.get('page')
-    page_obj = paginate(posts, page_number)
+    page_obj = paginate(posts, page_number,
+                        cursor=request.GET.get('cursor'))
     context = {
         'page_obj': page_obj,
+        'cache_version': cache_version,
     }
     return render(request, 'posts/follow.html', context)
 
@@ -115,8 +239,9 @@ def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     if author != user:
-        Follow.objects.get_or_create(user=user,
-                                     author=author)
+        with transaction.atomic():
+            Follow.objects.get_or_create(user=user,
+                                         author=author)
     return redirect('posts:profile', username=username)
 
 
@@ -125,5 +250,28 @@ def profile_unfollow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
     following = user.follower.filter(author=author).all()
-    following.delete()
+    with transaction.atomic():
+        following.delete()
     return redirect('posts:profile', username=username)
+
+
+def follow_batch(request, action):
+    usernames = request.POST.getlist('username')
+    if len(usernames) > FOLLOW_BATCH_SIZE:
+        return HttpResponseBadRequest(
+            f'Не больше {FOLLOW_BATCH_SIZE} авторов за запрос'
+        )
+    action(request.user, usernames)
+    return redirect('posts:follow_index')
+
+
+@login_required
+@require_POST
+def profile_follow_many(request):
+    return follow_batch(request, follow_many)
+
+
+@login_required
+@require_POST
+def profile_unfollow_many(request):
+    return follow_batch(request, unfollow_many)
@@ -46,33 +46,52 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'jobs.apps.JobsConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RateLimitMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
+    'core.middleware.TransactionModeMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# В продакшене шаблоны компилируются один раз на процесс; при DEBUG
+# загружаются заново, чтобы правки были видны без перезапуска.
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.cache.cache_timeout',
+                'core.context_processors.follow.followed_authors',
             ],
         },
     },
@@ -86,11 +105,104 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 60)),
+    }
+}
+
+# Выполняются для каждого нового соединения SQLite (core.db).
+# busy_timeout — ждать блокировку вместо «database is locked», WAL позволяет
+# читать во время записи; cache_size в КиБ со знаком минус.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Транзакции transaction.atomic сразу берут блокировку записи
+# (core.backends.sqlite3). В GET и HEAD запросах транзакции только читают
+# и начинаются с BEGIN DEFERRED (core.middleware.TransactionModeMiddleware),
+# кроме view из SQLITE_WRITING_GET_VIEWS, которые пишут и на GET.
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+SQLITE_WRITING_GET_VIEWS = (
+    'posts:profile_follow',
+    'posts:profile_unfollow',
+)
+
+# Реплики только для чтения, через запятую:
+# YATUBE_DB_REPLICAS=replica.sqlite3. Их читают view из REPLICA_VIEWS
+# (core.db.ReplicaRouter); в тестах реплики зеркалируют default.
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+        filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(','))):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, name),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db.ReplicaRouter']
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+    'api:posts',
+    'api:post_detail',
+    'api:comments',
+    'api:groups',
+    'api:group_posts',
+    'api:profile',
+    'api:profile_posts',
+    'api:follow',
+)
+# Сколько секунд после записи клиент читает только из primary; столько же
+# после bump() версии кеша из primary читают все (posts.caching).
+PRIMARY_STICKY_SECONDS = 10
+
+# Лимиты записей (core.middleware.RateLimitMiddleware): для view —
+# (запросов, секунд) на пользователя и на IP. Пустой словарь выключает
+# middleware.
+RATE_LIMITS = {
+    'posts:add_comment': {'user': (10, 60), 'ip': (30, 60)},
+    'posts:post_create': {'user': (5, 60), 'ip': (20, 60)},
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# По умолчанию кеш в памяти процесса. В продакшене нужен общий для всех
+# воркеров бэкенд, например файловый:
+#   YATUBE_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   YATUBE_CACHE_LOCATION=/var/tmp/yatube_cache
+# или memcached на локальном сокете:
+#   YATUBE_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+#   YATUBE_CACHE_LOCATION=unix:/run/memcached/memcached.sock
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('YATUBE_CACHE_BACKEND',
+                             'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', 'yatube'),
+        'KEY_PREFIX': 'yatube',
+        'TIMEOUT': int(os.getenv('YATUBE_CACHE_TIMEOUT', 300)),
     }
 }
 
+# Фрагменты лент сбрасываются сигналами при изменении контента
+# (posts.caching), поэтому с общим для воркеров кешем могут жить долго.
+# В LocMemCache версии у каждого воркера свои и сигнал одного воркера
+# не доходит до остальных: там фрагменты живут, как раньше, 20 секунд.
+SHARED_CACHE = not CACHES['default']['BACKEND'].endswith('LocMemCache')
+FEED_CACHE_TIMEOUT = 60 * 60 * 6 if SHARED_CACHE else 20
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -141,7 +253,56 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUM_OF_POSTS = 10
 
+# Посты авторов, у которых подписчиков больше этого числа, не раскладываются
+# по лентам подписчиков при публикации, а подмешиваются в ленту при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# При подписке в ленту попадают все посты автора. Когда автор перестаёт
+# быть популярным, его посты раскладываются по лентам фоновой задачей
+# posts.refill_timelines.
+TIMELINE_BATCH_SIZE = 500
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Картинки постов перекодируются воркером очереди (manage.py jobs_worker)
+# в прогрессивный JPEG или в WEBP.
+POSTS_IMAGE_FORMAT = 'JPEG'
+
+# Очередь фоновых задач jobs.
+JOBS_CONCURRENCY = 2
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 30
+JOBS_POLL_INTERVAL = 1
+JOBS_STALE_AFTER = 60 * 10
+# Выполняемые задачи продлеваются чаще, чем истекает JOBS_STALE_AFTER.
+JOBS_HEARTBEAT_INTERVAL = 60
+
+# Поиск по постам: 'auto' выбирает FTS5 для SQLite, 'index' — индекс
+# на моделях для остальных баз.
+POSTS_SEARCH_BACKEND = 'auto'
+
+# Доля запросов, для которых core.middleware.RequestMetricsMiddleware
+# собирает метрики; 0 отключает middleware.
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('YATUBE_METRICS_SAMPLE_RATE', 0)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Потоки, в которых yatube.asgi выполняет синхронные view.
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', 8))